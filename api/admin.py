@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, SubCategory, Brand, Product,Cart,CartItem,Order,OrderItem,OrderStatus,CustomUser,StoreSetting,Feedback
+from .models import Category, SubCategory, Brand, Product,Cart,CartItem,Order,OrderItem,OrderStatus,CustomUser,StoreSetting,Feedback,OutboxEvent
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
@@ -44,9 +44,9 @@ class BrandAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'brand', 'category', 'subcategory', 'price', 'stock', 'is_active']
+    list_display = ['id', 'sku', 'name', 'brand', 'category', 'subcategory', 'price', 'stock', 'is_active']
     list_filter = ['brand', 'category', 'is_active']
-    search_fields = ['name', 'description']
+    search_fields = ['sku', 'name', 'description']
 
 
 @admin.register(Cart)
@@ -93,4 +93,11 @@ admin.site.register(StoreSetting)
 class FeedbackAdmin(admin.ModelAdmin):
     list_display = ['user', 'product', 'created_at', 'is_resolved']
     list_filter = ['is_resolved', 'created_at']
-    search_fields = ['user__email', 'product__name', 'message']
\ No newline at end of file
+    search_fields = ['user__email', 'product__name', 'message']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'status', 'attempts', 'available_at', 'created_at']
+    list_filter = ['status', 'topic']
+    readonly_fields = ['created_at', 'processed_at', 'last_error']
@@ -1,8 +1,21 @@
 from rest_framework import serializers
 from api.models import Product,Feedback
+from api.perf import TimedSerializerMixin
 
-class ProductAdminSerializer(serializers.ModelSerializer):
+class ProductAdminSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = '__all__'
 
+
+
+class ProductBulkUpdateRowSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+    stock = serializers.IntegerField(min_value=0, required=False)
+    is_active = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        if len(attrs) == 1:
+            raise serializers.ValidationError("Provide at least one of price, stock or is_active.")
+        return attrs
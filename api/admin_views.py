@@ -1,12 +1,82 @@
-from rest_framework import viewsets, permissions,generics
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import viewsets, permissions,generics, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from api.models import Product
-from api.admin_serializers import ProductAdminSerializer
+from api.admin_serializers import ProductAdminSerializer, ProductBulkUpdateRowSerializer
+from api.cache import get_response_cache_stats
+from api.exports import FORMATS, iter_lines
+from api.order_export import ORDER_COLUMNS, ExportFilterError, iter_order_rows, order_queryset
+from api.signals import products_bulk_saved
+
+BULK_UPDATE_MAX_ROWS = 5000
+BULK_UPDATE_BATCH_SIZE = 500
+BULK_UPDATE_FIELDS = ('price', 'stock', 'is_active')
 
 class ProductAdminViewSet(viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductAdminSerializer
     permission_classes = [permissions.IsAdminUser]
 
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """
+        Apply a list of {id, price?, stock?, is_active?} rows. Invalid or unknown
+        rows are reported and skipped; the rest are written with one UPDATE per
+        BULK_UPDATE_BATCH_SIZE rows.
+        """
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Expected a non-empty list of rows.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > BULK_UPDATE_MAX_ROWS:
+            return Response({'error': f'At most {BULK_UPDATE_MAX_ROWS} rows per request.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        valid = {}  # product id -> (result index, values); a repeated id: last row wins
+        for row in rows:
+            serializer = ProductBulkUpdateRowSerializer(data=row)
+            if serializer.is_valid():
+                values = dict(serializer.validated_data)
+                product_id = values.pop('id')
+                results.append({'id': product_id, 'status': 'pending'})
+                if product_id in valid:
+                    results[valid[product_id][0]]['status'] = 'superseded'
+                valid[product_id] = (len(results) - 1, values)
+            else:
+                results.append({'id': row.get('id') if isinstance(row, dict) else None,
+                                'status': 'invalid', 'errors': serializer.errors})
+
+        with transaction.atomic():
+            products = Product.objects.select_for_update().only('id', *BULK_UPDATE_FIELDS, 'category_id',
+                                                                'subcategory_id', 'brand_id').in_bulk(list(valid))
+            changed_products, changed_fields = [], set()
+            for product_id, (index, values) in valid.items():
+                product = products.get(product_id)
+                if product is None:
+                    results[index]['status'] = 'not_found'
+                    continue
+                changed = [field for field, value in values.items() if getattr(product, field) != value]
+                results[index]['status'] = 'updated' if changed else 'unchanged'
+                if changed:
+                    for field in changed:
+                        setattr(product, field, values[field])
+                    changed_fields.update(changed)
+                    changed_products.append(product)
+            if changed_products:
+                Product.objects.bulk_update(changed_products, sorted(changed_fields),
+                                            batch_size=BULK_UPDATE_BATCH_SIZE)
+            # Same cache invalidation as a single save; price/stock/is_active aren't in the search index
+            products_bulk_saved(changed_products, reindex=False)
+
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        return Response({'summary': summary, 'results': results})
+
 
 class ProductUpdateView(generics.RetrieveUpdateAPIView):
     queryset = Product.objects.all()
@@ -18,4 +88,36 @@ class ProductUpdateView(generics.RetrieveUpdateAPIView):
 class ProductDeleteView(generics.DestroyAPIView):
     queryset = Product.objects.all()
     permission_classes = [permissions.IsAdminUser]
-    lookup_field = 'pk'  # or 'id' as per your model
\ No newline at end of file
+    lookup_field = 'pk'  # or 'id' as per your model
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        # Hit/miss counters per cached catalog view, for sizing the cache
+        return Response(get_response_cache_stats())
+
+
+class OrderExportView(APIView):
+    """Stream order lines as CSV/JSONL; ?from=&to= (dates or ISO datetimes), ?status=, ?file_format=."""
+    permission_classes = [permissions.IsAdminUser]
+    content_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request):
+        # "format" is DRF's renderer override, hence file_format
+        fmt = request.query_params.get('file_format', 'csv')
+        if fmt not in FORMATS:
+            return Response({'error': f"file_format must be one of {', '.join(FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = order_queryset(request.query_params.get('from'), request.query_params.get('to'),
+                                      request.query_params.get('status'))
+        except ExportFilterError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(iter_lines(fmt, ORDER_COLUMNS, iter_order_rows(queryset)),
+                                         content_type=self.content_types[fmt])
+        filename = f'orders-{timezone.now():%Y%m%d%H%M%S}.{fmt}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import outbox, perf, signals  # noqa: F401
+        from .cache import shared_cache_check
+        checks.register(shared_cache_check, checks.Tags.caches, deploy=True)
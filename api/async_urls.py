@@ -0,0 +1,11 @@
+from django.urls import path
+
+from api import async_views
+
+urlpatterns = [
+    path('products/', async_views.list_products_view, name='async-product-list'),
+    path('products/<int:pk>/', async_views.product_detail_view, name='async-product-detail'),
+    path('search-products/', async_views.search_products_view, name='async-search-products'),
+    path('taxonomy/', async_views.taxonomy_view, name='async-taxonomy'),
+    path('cart/count/', async_views.cart_item_count_view, name='async-cart-item-count'),
+]
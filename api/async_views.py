@@ -0,0 +1,117 @@
+"""
+Native async versions of the read-heavy endpoints.
+
+These are plain Django async views on the async ORM, so under an ASGI server
+(``pm.asgi:application``, e.g. ``gunicorn pm.asgi:application -k
+uvicorn.workers.UvicornWorker``) a request waiting on the database does not
+tie up a worker thread. They return the same JSON as their DRF counterparts
+in ``api.views`` and are mounted under ``api/async/``.
+"""
+from asgiref.sync import sync_to_async
+from django.core.paginator import Paginator
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import StatelessJWTAuthentication
+from .cache import cache_response, json_response
+from .models import CartItem, Product
+from .pagination import ProductPagination, get_product_paginator
+from .search import search_results
+from .serializers import ProductDetailSerializer, ProductListSerializer
+from .taxonomy import get_taxonomy
+
+
+def _page_params(request):
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    try:
+        page_size = int(request.GET.get(ProductPagination.page_size_query_param, ProductPagination.page_size))
+    except ValueError:
+        page_size = ProductPagination.page_size
+    if page_size <= 0:
+        page_size = ProductPagination.page_size
+    return page, min(page_size, ProductPagination.max_page_size)
+
+
+def _paginated(request, count, page, page_size, results):
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page * page_size < count else None
+    if page <= 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+    return {'count': count, 'next': next_url, 'previous': previous_url, 'results': results}
+
+
+@require_GET
+@cache_response(lambda request: ['products'])
+async def list_products_view(request):
+    # Same cache namespace and paginators (page numbers or ?pagination=cursor) as views.list_products_view
+    request = Request(request)
+    paginator = get_product_paginator(request)
+    try:
+        rows = await paginator.apaginate_queryset(Product.objects.select_related('brand'), request)
+    except NotFound as exc:
+        return json_response({'detail': exc.detail}, status=404)
+    serializer = ProductListSerializer(rows, many=True, context={'request': request})
+    return json_response(paginator.get_paginated_response(serializer.data).data)
+
+
+@require_GET
+async def product_detail_view(request, pk):
+    try:
+        product = await Product.objects.select_related(
+            'brand', 'category', 'subcategory__category', 'feedback_stats',
+        ).aget(pk=pk)
+    except Product.DoesNotExist:
+        return json_response({"error": "Product not found."}, status=404)
+    return json_response(ProductDetailSerializer(product).data)
+
+
+@require_GET
+async def search_products_view(request):
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return await list_products_view(request)
+
+    page, page_size = _page_params(request)
+
+    def count_and_page():
+        # The ranking is only counted and sliced, in SQL with the database backend
+        results = search_results(query)
+        offset = max(page - 1, 0) * page_size
+        return Paginator(results, page_size).count, list(results[offset:offset + page_size])
+
+    count, page_ids = await sync_to_async(count_and_page)()
+    if page < 1 or (page > 1 and (page - 1) * page_size >= count):
+        return json_response({'detail': 'Invalid page.'}, status=404)
+    products = await Product.objects.select_related('brand').ain_bulk(page_ids)
+    rows = [products[pk] for pk in page_ids if pk in products]
+    return json_response(_paginated(request, count, page, page_size, ProductListSerializer(rows, many=True).data))
+
+
+@require_GET
+async def taxonomy_view(request):
+    # Categories tree plus brands, straight from the per-worker taxonomy cache
+    taxonomy = await sync_to_async(get_taxonomy)()
+    return json_response({'categories': taxonomy['tree'], 'brands': taxonomy['brands']})
+
+
+@require_GET
+async def cart_item_count_view(request):
+    # The sync API's authentication (token checks, cached is_active), so the two paths can't drift apart
+    try:
+        authenticated = await sync_to_async(StatelessJWTAuthentication().authenticate)(request)
+    except APIException as exc:
+        return json_response({'detail': exc.detail}, status=401)
+    if authenticated is None:
+        return json_response({'detail': 'Authentication credentials were not provided.'}, status=401)
+    user, _ = authenticated
+    count = await CartItem.objects.filter(cart__user_id=user.id).acount()
+    return json_response({"count": count})
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import CustomUser
+from .perf import timer
+
+ACTIVE_KEY = 'auth:active:{}'
+
+
+class TimedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that reports its time as ``auth`` in the request metrics."""
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
+
+
+def is_user_active(user_id):
+    """``CustomUser.is_active`` through a short-lived cache (cleared by api.signals when the user changes)."""
+    key = ACTIVE_KEY.format(user_id)
+    active = cache.get(key)
+    if active is None:
+        active = bool(CustomUser.objects.filter(pk=user_id).values_list('is_active', flat=True).first())
+        cache.set(key, active, settings.AUTH_ACTIVE_CACHE_TTL)
+    return active
+
+
+def forget_user_active(user_id):
+    cache.delete(ACTIVE_KEY.format(user_id))
+
+
+class ClaimsUser(TokenUser):
+    """Token-backed user exposing the email/name claims set by MyTokenObtainPairSerializer."""
+
+    @cached_property
+    def id(self):
+        # simplejwt stores the claim as a string; keep ids comparable with CustomUser.pk
+        return CustomUser._meta.pk.to_python(super().id)
+
+    @property
+    def email(self):
+        return self.token.get('email', '')
+
+    @property
+    def name(self):
+        return self.token.get('name', '')
+
+    def __str__(self):
+        return self.email or super().__str__()
+
+
+class StatelessJWTAuthentication(TimedJWTAuthentication):
+    """
+    Authenticates from the token claims alone: ``request.user`` is a ClaimsUser,
+    not a CustomUser row, so views must filter on ``request.user.id`` and not
+    touch model attributes or relations. Saves the per-request user query.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if not is_user_active(user_id):
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return ClaimsUser(validated_token)
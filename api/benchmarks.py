@@ -0,0 +1,163 @@
+"""
+Repeatable HTTP benchmark suite.
+
+Each scenario drives one endpoint through the full middleware/DRF stack with
+Django's test client and records wall-clock latency and the number of SQL
+queries per request. Run it against a database populated by ``seed_data``
+(see the ``benchmark_api`` command) and compare the JSON reports over time.
+"""
+import json
+import random
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import Brand, Cart, CartItem, Category, CustomUser, Product
+
+PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Called before every request with the suite; returns (path, payload)
+    build: Callable
+    # Optional per-request preparation that is not measured (e.g. filling a cart)
+    prepare: Callable = None
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+class BenchmarkSuite:
+    def __init__(self, iterations=100, warmup=5, cold_cache=False, seed=42, host='localhost'):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.cold_cache = cold_cache
+        self.rng = random.Random(seed)
+        self.client = Client(HTTP_HOST=host)
+        self._load_fixtures()
+
+    def _load_fixtures(self):
+        self.product_ids = list(Product.objects.filter(is_active=True, stock__gt=100).values_list('pk', flat=True)[:2000])
+        self.category_ids = list(Category.objects.values_list('pk', flat=True))
+        self.brand_ids = list(Brand.objects.values_list('pk', flat=True))
+        self.search_words = list(
+            Product.objects.filter(pk__in=self.product_ids[:200]).values_list('name', flat=True)
+        )
+        users = list(CustomUser.objects.filter(is_active=True, cart__isnull=False).order_by('pk')[:20])
+        if not (self.product_ids and users and self.category_ids and self.brand_ids):
+            raise ValueError("Benchmark needs seeded data; run `manage.py seed_data` first.")
+        self.tokens = {user.pk: str(AccessToken.for_user(user)) for user in users}
+        self.user_ids = list(self.tokens)
+
+    # --- request builders -------------------------------------------------
+
+    def _product_id(self):
+        return self.rng.choice(self.product_ids)
+
+    def _search_term(self):
+        return self.rng.choice(self.rng.choice(self.search_words).split())[:5]
+
+    def _id_list(self, ids, size=3):
+        return ','.join(str(pk) for pk in self.rng.sample(ids, min(size, len(ids))))
+
+    def _fill_cart(self, user_id):
+        cart = Cart.objects.get(user_id=user_id)
+        CartItem.objects.filter(cart=cart).delete()
+        CartItem.objects.bulk_create([CartItem(cart=cart, product_id=self._product_id(), quantity=1) for _ in range(3)])
+
+    def scenarios(self):
+        return [
+            Scenario('products.list', 'get', lambda: ('/api/products/?page=%d' % self.rng.randint(1, 5), None)),
+            Scenario('products.list.cursor', 'get', lambda: ('/api/products/?pagination=cursor', None)),
+            Scenario('products.detail', 'get', lambda: ('/api/products/%d/' % self._product_id(), None)),
+            Scenario('products.search', 'get', lambda: ('/api/search-products/?q=%s' % self._search_term(), None)),
+            Scenario('products.by_category', 'get',
+                     lambda: ('/api/products/category/%d/' % self.rng.choice(self.category_ids), None)),
+            Scenario('products.by_brand_ids', 'get',
+                     lambda: ('/api/products/by-brand-ids/?ids=%s' % self._id_list(self.brand_ids), None)),
+            Scenario('products.filter', 'get',
+                     lambda: ('/api/products/filter/?category_ids=%d' % self.rng.choice(self.category_ids), None)),
+            Scenario('taxonomy.categories', 'get', lambda: ('/api/categories/', None)),
+            Scenario('cart.count', 'get', lambda: ('/api/cart/count/', None)),
+            Scenario('cart.view', 'get', lambda: ('/api/my-cart/', None)),
+            Scenario('cart.add', 'post', lambda: ('/api/cart/add/', {'product_id': self._product_id(), 'quantity': 1})),
+            Scenario('orders.list', 'get', lambda: ('/api/my-orders/', None)),
+            Scenario('orders.place', 'post', lambda: ('/api/place-order/', {}), prepare=self._fill_cart),
+        ]
+
+    # --- measurement ------------------------------------------------------
+
+    def _request(self, scenario, user_id):
+        if scenario.prepare:
+            scenario.prepare(user_id)
+        if self.cold_cache:
+            cache.clear()
+        path, payload = scenario.build()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {self.tokens[user_id]}'}
+        send = getattr(self.client, scenario.method)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if payload is None:
+                response = send(path, **headers)
+            else:
+                response = send(path, data=json.dumps(payload), content_type='application/json', **headers)
+            elapsed = (time.perf_counter() - started) * 1000
+        return elapsed, len(queries), response.status_code
+
+    def run_scenario(self, scenario):
+        for _ in range(self.warmup):
+            self._request(scenario, self.rng.choice(self.user_ids))
+
+        latencies, query_counts, statuses = [], [], {}
+        for _ in range(self.iterations):
+            elapsed, queries, status = self._request(scenario, self.rng.choice(self.user_ids))
+            latencies.append(elapsed)
+            query_counts.append(queries)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        result = {
+            'endpoint': scenario.name,
+            'requests': len(latencies),
+            'status_codes': statuses,
+            'latency_ms': {f'p{pct}': round(percentile(latencies, pct), 3) for pct in PERCENTILES},
+            'queries': {
+                'mean': round(statistics.mean(query_counts), 2),
+                'max': max(query_counts),
+            },
+        }
+        result['latency_ms']['mean'] = round(statistics.mean(latencies), 3)
+        return result
+
+    def run(self, only=None):
+        results = []
+        for scenario in self.scenarios():
+            if only and scenario.name not in only:
+                continue
+            results.append(self.run_scenario(scenario))
+        return {
+            'iterations': self.iterations,
+            'warmup': self.warmup,
+            'cold_cache': self.cold_cache,
+            'database': connection.vendor,
+            'dataset': {
+                'products': Product.objects.count(),
+                'users': CustomUser.objects.count(),
+            },
+            'results': results,
+        }
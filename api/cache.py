@@ -0,0 +1,288 @@
+"""
+Versioned namespaces on top of Django's cache framework.
+
+A namespace version is a counter in the shared cache. Anything derived from a
+namespace (a per-process copy, a cached response) is stored with the version
+it was built from, and bumping the version invalidates all of it at once
+without having to find the individual keys. Missing versions are seeded with
+the current time in nanoseconds, so an evicted counter never comes back with
+a value that was already used.
+
+``cache_response`` builds on this to cache whole catalog responses; a Product,
+Brand or Category change only bumps the namespaces whose listings it appears
+in (see ``api.signals``).
+
+Invalidation only reaches other workers when they share the cache. With a
+process-local backend (LocMemCache, the development default) each worker has
+its own counters and never sees another worker's bumps, so production should
+run a shared backend (Redis, Memcached, database) or a single process
+(``CACHE_ALLOW_LOCAL``). ``manage.py check --deploy`` reports other setups;
+at runtime they keep no per-process copies and serve responses uncached.
+With DummyCache nothing is cached at all, so there is nothing to go stale.
+"""
+import functools
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'ns-version:{}'
+
+DUMMY_CACHE_BACKEND = 'django.core.cache.backends.dummy.DummyCache'
+# Backends whose entries are not seen by other processes (DummyCache keeps none at all)
+LOCAL_CACHE_BACKENDS = {'django.core.cache.backends.locmem.LocMemCache', DUMMY_CACHE_BACKEND}
+LOCAL_CACHE_MESSAGE = (
+    "The default cache ({backend}) is private to each process, so cache invalidation does not reach the "
+    "other workers: catalog responses are served uncached and in-memory copies reload on every read. "
+    "Set CACHE_BACKEND to a shared backend, or CACHE_ALLOW_LOCAL=True to run a single process."
+)
+
+
+def is_shared_cache():
+    """Whether every worker sees the same default cache (and therefore the same namespace versions)."""
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def is_coherent_cache():
+    """
+    Whether cached data is invalidated everywhere it is served from: a shared
+    backend, DummyCache (which caches nothing), or a process-local backend
+    in a deployment that runs a single process (``CACHE_ALLOW_LOCAL``).
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    return is_shared_cache() or backend == DUMMY_CACHE_BACKEND or settings.CACHE_ALLOW_LOCAL
+
+
+def shared_cache_check(app_configs, **kwargs):
+    # `manage.py check --deploy`
+    if is_coherent_cache():
+        return []
+    return [checks.Error(LOCAL_CACHE_MESSAGE.format(backend=settings.CACHES['default']['BACKEND']), id='api.E001')]
+
+
+@functools.cache
+def warn_incoherent_cache():
+    logger.warning(LOCAL_CACHE_MESSAGE.format(backend=settings.CACHES['default']['BACKEND']))
+
+
+def get_versions(namespaces):
+    keys = {VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), None)
+        # Another process may have seeded the key first, its value wins
+        found.update(cache.get_many(missing))
+    return {namespace: found.get(key) for key, namespace in keys.items()}
+
+
+def get_version(namespace):
+    return get_versions([namespace])[namespace]
+
+
+def bump_versions(namespaces):
+    """Invalidate namespaces once the current transaction commits."""
+    namespaces = set(namespaces)
+
+    def bump():
+        for namespace in namespaces:
+            key = VERSION_KEY.format(namespace)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+
+    transaction.on_commit(bump)
+
+
+class VersionedLocalCache:
+    """
+    Per-process copy of a value, reloaded when its namespace version moves.
+
+    The version is read on every ``get``, so a change is served from the next
+    read after its transaction commits, in every worker. Where the versions
+    can't be trusted for that (see ``is_coherent_cache``) no copy is kept and
+    every read loads. ``max_age`` (seconds) also reloads the copy after that
+    long, bounding how stale it can get when a bump is missed (a queryset
+    update or a raw write that sends no signals).
+    """
+
+    def __init__(self, namespace, loader, max_age=None):
+        self.namespace = namespace
+        self.loader = loader
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._version = None
+        self._value = None
+        self._loaded_at = None
+
+    def _is_fresh(self, version):
+        if version != self._version:
+            return False
+        return self.max_age is None or time.monotonic() - self._loaded_at < self.max_age
+
+    def get(self):
+        if not is_coherent_cache():
+            warn_incoherent_cache()
+            return self.loader()  # other workers' bumps would never reach this copy
+        version = get_version(self.namespace)
+        if version is None:
+            return self.loader()  # DummyCache: no version to check a copy against
+        if not self._is_fresh(version):
+            with self._lock:
+                if not self._is_fresh(version):
+                    # Version is read before loading, so a concurrent bump can only make us reload again
+                    self._value = self.loader()
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+        return self._value
+
+    def invalidate(self):
+        bump_versions([self.namespace])
+
+
+# Response caching for anonymous catalog endpoints
+
+RESPONSE_KEY = 'resp:{view}:{digest}'
+STATS_KEY = 'resp-stats:{view}:{outcome}'
+DEFAULT_CACHE_PARAMS = ('ids', 'page', 'page_size', 'pagination', 'cursor')
+
+cached_views = set()
+
+
+def normalized_query(request, params):
+    query = getattr(request, 'query_params', request.GET)  # plain HttpRequest in async views
+    items = []
+    for name in sorted(params):
+        values = query.getlist(name)
+        if not values:
+            continue
+        if name == 'ids' or name.endswith('_ids'):
+            ids = sorted({int(pk) for value in values for pk in value.split(',') if pk.isdigit()})
+            values = [','.join(map(str, ids))]
+        items.append((name, values))
+    return urlencode(items, doseq=True)
+
+
+def response_key(view_name, request, params, versions):
+    raw = '|'.join([
+        request.get_host(),
+        request.path,
+        normalized_query(request, params),
+        ','.join(f'{namespace}={versions[namespace]}' for namespace in sorted(versions)),
+    ])
+    return RESPONSE_KEY.format(view=view_name, digest=hashlib.sha1(raw.encode()).hexdigest())
+
+
+def record(view_name, outcome):
+    key = STATS_KEY.format(view=view_name, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_response_cache_stats():
+    keys = {
+        STATS_KEY.format(view=view_name, outcome=outcome): (view_name, outcome)
+        for view_name in cached_views for outcome in ('hit', 'miss')
+    }
+    counts = cache.get_many(list(keys))
+    stats = {view_name: {'hit': 0, 'miss': 0} for view_name in sorted(cached_views)}
+    for key, (view_name, outcome) in keys.items():
+        stats[view_name][outcome] = counts.get(key, 0)
+    for view_stats in stats.values():
+        total = view_stats['hit'] + view_stats['miss']
+        view_stats['hit_ratio'] = round(view_stats['hit'] / total, 4) if total else None
+    return stats
+
+
+def cache_response(namespaces, params=DEFAULT_CACHE_PARAMS, timeout=None):
+    """
+    Cache a GET view's response data, keyed on host, path, the normalized
+    ``params`` and the versions of ``namespaces(request, *args, **kwargs)``.
+    Async views must return ``json_response``.
+    """
+    def decorator(view):
+        view_name = view.__name__
+        cached_views.add(view_name)
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return view(request, *args, **kwargs)
+            if not is_coherent_cache():
+                warn_incoherent_cache()
+                return view(request, *args, **kwargs)
+
+            key, data = lookup(request, args, kwargs)
+            if data is not None:
+                return hit(Response(data))
+            return store(key, view(request, *args, **kwargs))
+
+        @functools.wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await view(request, *args, **kwargs)
+            if not is_coherent_cache():
+                warn_incoherent_cache()
+                return await view(request, *args, **kwargs)
+
+            key, data = await sync_to_async(lookup)(request, args, kwargs)
+            if data is not None:
+                return hit(json_response(data))
+            return await sync_to_async(store)(key, await view(request, *args, **kwargs))
+
+        def lookup(request, args, kwargs):
+            versions = get_versions(namespaces(request, *args, **kwargs))
+            key = response_key(view_name, request, params, versions)
+            data = cache.get(key)
+            record(view_name, 'miss' if data is None else 'hit')
+            return key, data
+
+        def hit(response):
+            response['X-Cache'] = 'HIT'
+            return response
+
+        def store(key, response):
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout or settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+            return response
+
+        return async_wrapper if iscoroutinefunction(view) else wrapper
+    return decorator
+
+
+def json_response(data, status=200):
+    """JsonResponse for async views, keeping ``data`` for cache_response like a DRF Response does."""
+    # DRF's encoder keeps decimals/datetimes identical to the sync endpoints
+    response = JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+    response.data = data
+    return response
+
+
+def product_namespaces(*groups):
+    """Namespaces holding listings for products with the given category/brand/subcategory ids."""
+    namespaces = {'products'}
+    for group in groups:
+        if not group:
+            continue
+        for field in ('category', 'brand', 'subcategory'):
+            if group.get(f'{field}_id'):
+                namespaces.add(f'{field}:{group[f"{field}_id"]}')
+    return namespaces
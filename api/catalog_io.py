@@ -0,0 +1,265 @@
+"""
+Bulk product import/export.
+
+Products are keyed by their ``sku``; rows without one fall back to the ``id``
+column, so products that were never given a SKU survive an export/import
+round-trip (they can be updated that way, not created). Imports are processed in fixed-size
+chunks: each chunk is looked up with one query, written with
+``bulk_create``/``bulk_update`` inside its own transaction, and then pushed
+through ``api.signals.products_bulk_saved`` since bulk writes don't send model
+signals.
+"""
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Brand, Category, Product, SubCategory
+from .signals import PRODUCT_GROUP_FIELDS, products_bulk_saved
+
+PRODUCT_COLUMNS = ['id', 'sku', 'name', 'description', 'price', 'stock', 'category', 'subcategory', 'brand', 'is_active']
+EXPORT_CHUNK_SIZE = 2000
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'f'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_product_rows(queryset=None):
+    """Yield export rows with taxonomy rendered by name, streaming from the database."""
+    queryset = Product.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'sku', 'name', 'description', 'price', 'stock', 'category__name', 'subcategory__name', 'brand__name',
+        'is_active',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    for values in rows:
+        yield dict(zip(PRODUCT_COLUMNS, values))
+
+
+def read_rows(stream, fmt):
+    """Yield ``(row_number, row)`` pairs from a CSV or JSONL text stream."""
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=2):  # line 1 is the header
+            yield number, row
+    elif fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, RowError(f"invalid JSON: {exc}")
+                continue
+            yield number, row if isinstance(row, dict) else RowError("expected a JSON object")
+    else:
+        raise ValueError(f"Unknown format {fmt!r}.")
+
+
+class TaxonomyResolver:
+    """Resolves Brand/Category/SubCategory names to ids from maps loaded once per import."""
+
+    def __init__(self, create_missing=False):
+        self.create_missing = create_missing
+        self.categories = self._name_map(Category.objects.values_list('pk', 'name'))
+        self.brands = self._name_map(Brand.objects.values_list('pk', 'name'))
+        self.subcategories = {}
+        for pk, category_id, name in SubCategory.objects.order_by('pk').values_list('pk', 'category_id', 'name'):
+            self.subcategories.setdefault((category_id, name.casefold()), pk)
+
+    @staticmethod
+    def _name_map(rows):
+        names = {}
+        for pk, name in sorted(rows):
+            names.setdefault(name.casefold(), pk)  # duplicates resolve to the oldest row
+        return names
+
+    def _resolve(self, names, key, label, create):
+        if key in names:
+            return names[key]
+        if not self.create_missing:
+            raise RowError(f"unknown {label}")
+        names[key] = create().pk
+        return names[key]
+
+    def category(self, name):
+        return self._resolve(self.categories, name.casefold(), f"category {name!r}",
+                             lambda: Category.objects.create(name=name))
+
+    def brand(self, name):
+        return self._resolve(self.brands, name.casefold(), f"brand {name!r}", lambda: Brand.objects.create(name=name))
+
+    def subcategory(self, category_id, name):
+        if category_id is None:
+            raise RowError(f"subcategory {name!r} needs a category")
+        return self._resolve(self.subcategories, (category_id, name.casefold()), f"subcategory {name!r}",
+                             lambda: SubCategory.objects.create(category_id=category_id, name=name))
+
+
+def _text(row, column):
+    value = row.get(column)
+    return '' if value is None else str(value).strip()
+
+
+def _validate(attname, value):
+    """Run the model field's validators (max_length, max_digits, integer range) on a parsed value."""
+    field = Product._meta.get_field(attname)
+    try:
+        field.run_validators(value)
+    except ValidationError as exc:
+        raise RowError(f"invalid {field.name}: {' '.join(exc.messages)}")
+    return value
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise RowError(f"invalid is_active {value!r}")
+
+
+class ProductImporter:
+    def __init__(self, chunk_size=1000, create_taxonomy=False):
+        self.chunk_size = chunk_size
+        self.taxonomy = TaxonomyResolver(create_missing=create_taxonomy)
+        self.created = self.updated = self.unchanged = 0
+        self.errors = []  # (row_number, message)
+
+    def run(self, numbered_rows):
+        numbered_rows = iter(numbered_rows)
+        while True:
+            chunk = list(islice(numbered_rows, self.chunk_size))
+            if not chunk:
+                break
+            self._import_chunk(chunk)
+        return self
+
+    def parse(self, row):
+        """
+        Return ``(lookup, {attname: value})`` for the columns present in ``row``, where ``lookup`` is
+        ``('sku', sku)`` or, for rows without a SKU, ``('pk', id)``.
+
+        A ``subcategory`` given without a ``category`` column is left under the ``subcategory`` key, to be
+        resolved against the existing product's category.
+        """
+        if isinstance(row, Exception):
+            raise row
+        sku = _text(row, 'sku')
+        if sku:
+            lookup = ('sku', _validate('sku', sku))
+        elif _text(row, 'id'):
+            try:
+                lookup = ('pk', int(_text(row, 'id')))
+            except ValueError:
+                raise RowError(f"invalid id {row['id']!r}")
+        else:
+            raise RowError("sku or id is required")
+        values = {}
+        if 'name' in row:
+            values['name'] = _text(row, 'name')
+            if not values['name']:
+                raise RowError("name cannot be blank")
+            _validate('name', values['name'])
+        if 'description' in row:
+            values['description'] = _text(row, 'description')
+        if 'price' in row:
+            try:
+                price = Decimal(_text(row, 'price')).quantize(Decimal('0.01'))
+            except InvalidOperation:
+                raise RowError(f"invalid price {row['price']!r}")
+            if not price.is_finite() or price < 0:
+                raise RowError(f"invalid price {row['price']!r}")
+            values['price'] = _validate('price', price)
+        if 'stock' in row:
+            try:
+                stock = int(_text(row, 'stock'))
+            except ValueError:
+                raise RowError(f"invalid stock {row['stock']!r}")
+            if stock < 0:  # as in the admin bulk update
+                raise RowError(f"invalid stock {row['stock']!r}")
+            values['stock'] = _validate('stock', stock)
+        if 'is_active' in row and _text(row, 'is_active'):
+            values['is_active'] = _parse_bool(row['is_active'])
+
+        if 'category' in row:
+            name = _text(row, 'category')
+            values['category_id'] = self.taxonomy.category(name) if name else None
+        if 'subcategory' in row:
+            name = _text(row, 'subcategory')
+            if not name:
+                values['subcategory_id'] = None
+            elif 'category_id' in values:
+                values['subcategory_id'] = self.taxonomy.subcategory(values['category_id'], name)
+            else:
+                values['subcategory'] = name
+        if 'brand' in row:
+            name = _text(row, 'brand')
+            values['brand_id'] = self.taxonomy.brand(name) if name else None
+        return lookup, values
+
+    def _import_chunk(self, chunk):
+        parsed = {}
+        for number, row in chunk:
+            try:
+                lookup, values = self.parse(row)
+            except RowError as exc:
+                self.errors.append((number, str(exc)))
+                continue
+            parsed[lookup] = (number, values)  # a repeated key within a chunk: last row wins
+
+        with transaction.atomic():
+            existing = {}
+            for field in ('sku', 'pk'):
+                keys = [key for lookup_field, key in parsed if lookup_field == field]
+                if keys:
+                    products = Product.objects.in_bulk(keys, field_name=field)
+                    existing.update(((field, key), product) for key, product in products.items())
+            previous_groups = [
+                {field: getattr(product, field) for field in PRODUCT_GROUP_FIELDS} for product in existing.values()
+            ]
+            creates, updates, update_fields = [], [], set()
+            for (field, key), (number, values) in parsed.items():
+                product = existing.get((field, key))
+                if product is None and field == 'pk':
+                    self.errors.append((number, f"unknown product id {key}"))
+                    continue
+                if 'subcategory' in values:
+                    try:
+                        values['subcategory_id'] = self.taxonomy.subcategory(
+                            product and product.category_id, values.pop('subcategory'))
+                    except RowError as exc:
+                        self.errors.append((number, str(exc)))
+                        continue
+                if product is None:
+                    if 'name' not in values or 'price' not in values:
+                        self.errors.append((number, "new products need a name and a price"))
+                        continue
+                    creates.append(Product(sku=key, **values))
+                    continue
+                changed = [attname for attname, value in values.items() if getattr(product, attname) != value]
+                if not changed:
+                    self.unchanged += 1
+                    continue
+                for attname in changed:
+                    setattr(product, attname, values[attname])
+                update_fields.update(attname.removesuffix('_id') for attname in changed)
+                updates.append(product)
+
+            Product.objects.bulk_create(creates)
+            if updates:
+                Product.objects.bulk_update(updates, sorted(update_fields))
+
+        self.created += len(creates)
+        self.updated += len(updates)
+        if creates and creates[0].pk is None:  # backends without RETURNING don't set pks on bulk_create
+            creates = list(Product.objects.filter(sku__in=[product.sku for product in creates]))
+        # Bulk writes bypass the post_save receivers, so run their work once per chunk
+        products_bulk_saved(creates + updates, previous_groups)
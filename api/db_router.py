@@ -0,0 +1,106 @@
+"""
+Read-replica routing.
+
+When ``REPLICA_DATABASES`` is configured (``DATABASE_REPLICA_URL`` in
+pm/settings.py), ``ReplicaRouter`` sends reads of catalog, taxonomy and
+feedback models to a replica. Everything else, every write, and any read
+that needs read-your-writes goes to ``default``:
+
+* reads outside a request (commands, workers) and non-GET requests;
+* the rest of a request once it has written anything;
+* a user's requests for ``REPLICA_PIN_SECONDS`` after one of their requests
+  wrote, tracked in the shared cache so it holds across workers;
+* all catalog reads for the same window after a catalog edit bumps the
+  response-cache namespaces (``pin_catalog``, called from ``api.signals``), so
+  that responses cached under the new version aren't built from a lagging
+  replica. Row locks and stock updates during cart and checkout don't pin,
+  and neither do feedback writes or email changes (they only bump feedback
+  feeds).
+
+``ReplicaRoutingMiddleware`` (api.middleware) opens the per-request state.
+Pins live in the default cache, so replicas need a cache shared by all workers.
+"""
+import base64
+import binascii
+import json
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+REPLICA_MODELS = {
+    'api.Product', 'api.Category', 'api.SubCategory', 'api.Brand', 'api.ProductSearchTerm',
+    'api.Feedback', 'api.ProductFeedbackStats',
+}
+USER_PIN_KEY = 'replica-pin:user:{}'
+CATALOG_PIN_KEY = 'replica-pin:catalog'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    def __init__(self, user_key, pinned=False):
+        self.user_key = user_key
+        self.pinned = pinned
+        self.wrote = False
+
+
+def user_key(request):
+    """Identify the caller for pinning; the JWT is not verified since this only picks a database."""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    parts = header.split()
+    if len(parts) == 2 and parts[0] in jwt_settings.AUTH_HEADER_TYPES:
+        try:
+            payload = parts[1].split('.')[1]
+            claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+            return f'u{claims[jwt_settings.USER_ID_CLAIM]}'
+        except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+            return None
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f's{session_key}' if session_key else None
+
+
+def begin(request):
+    key = user_key(request)
+    if request.method not in SAFE_METHODS:
+        return _state.set(RoutingState(key, pinned=True))
+    pins = [CATALOG_PIN_KEY] + ([USER_PIN_KEY.format(key)] if key else [])
+    return _state.set(RoutingState(key, pinned=bool(cache.get_many(pins))))
+
+
+def end(token):
+    state = _state.get()
+    _state.reset(token)
+    if state is not None and state.wrote and state.user_key:
+        cache.set(USER_PIN_KEY.format(state.user_key), 1, settings.REPLICA_PIN_SECONDS)
+
+
+def pin_catalog():
+    """Keep every catalog read on the primary for REPLICA_PIN_SECONDS once the current transaction commits."""
+    if settings.REPLICA_DATABASES:
+        transaction.on_commit(lambda: cache.set(CATALOG_PIN_KEY, 1, settings.REPLICA_PIN_SECONDS))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or state is None or state.pinned or model._meta.label not in REPLICA_MODELS:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas mirror default
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
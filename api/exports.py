@@ -0,0 +1,57 @@
+"""
+Streaming CSV/JSONL writers shared by the bulk export commands.
+
+Rows are written as they are produced, so callers can feed them straight from
+``QuerySet.iterator()`` and keep memory flat regardless of table size.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ('csv', 'jsonl')
+
+
+def guess_format(path, default='csv'):
+    """Infer the format from a file extension (``.jsonl``/``.ndjson`` or ``.csv``)."""
+    if path and path.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path and path.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+class Echo:
+    """File-like object whose ``write`` returns the value, for StreamingHttpResponse."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(columns, rows):
+    """Yield CSV lines (header first) for an iterable of ``{column: value}`` dicts."""
+    writer = csv.DictWriter(Echo(), fieldnames=columns, extrasaction='ignore')
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow({column: '' if row.get(column) is None else row[column] for column in columns})
+
+
+def iter_jsonl(columns, rows):
+    """Yield one JSON document per line for an iterable of ``{column: value}`` dicts."""
+    for row in rows:
+        yield json.dumps({column: row.get(column) for column in columns}, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_lines(fmt, columns, rows):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}.")
+    return iter_csv(columns, rows) if fmt == 'csv' else iter_jsonl(columns, rows)
+
+
+def write_rows(stream, fmt, columns, rows):
+    """Write rows to a text stream; returns the number of data rows written."""
+    count = -1 if fmt == 'csv' else 0  # don't count the CSV header
+    for line in iter_lines(fmt, columns, rows):
+        stream.write(line)
+        count += 1
+    return max(count, 0)
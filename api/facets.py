@@ -0,0 +1,82 @@
+"""
+Faceted filtering over the product catalog.
+
+Facet counts are disjunctive: the count shown next to a brand is what the
+result would contain if that brand were added to the current brand
+selection, with the category/subcategory selections and the price range
+still applied. All of it comes from one GROUP BY over
+(category, subcategory, brand) that is rolled up in Python, so the number of
+rows returned is bounded by the taxonomy, not by the catalog.
+"""
+from django.db.models import Count, Max, Min, Q
+
+from .taxonomy import get_taxonomy
+
+FACETS = (
+    # (facet name, product field, taxonomy key)
+    ('categories', 'category_id', 'categories'),
+    ('subcategories', 'subcategory_id', 'subcategories'),
+    ('brands', 'brand_id', 'brands'),
+)
+
+
+def filter_products(queryset, selections, min_price=None, max_price=None, in_stock=False):
+    """Apply the facet selections (``{field: [ids]}``), price range and stock filter."""
+    queryset = queryset.filter(**_selection_filters(selections))
+    return queryset.filter(_price_filter(min_price, max_price)).filter(**_stock_filter(in_stock))
+
+
+def compute_facets(queryset, selections, min_price=None, max_price=None, in_stock=False):
+    in_price = _price_filter(min_price, max_price)
+    groups = list(
+        queryset.filter(**_stock_filter(in_stock))
+        .values('category_id', 'subcategory_id', 'brand_id')
+        .annotate(count=Count('id', filter=in_price), min_price=Min('price'), max_price=Max('price'))
+        .order_by()
+    )
+
+    def matches(group, skip=None):
+        return all(
+            group[field] in ids
+            for field, ids in selections.items()
+            if ids and field != skip
+        )
+
+    taxonomy = get_taxonomy()
+    facets = {}
+    for name, field, taxonomy_key in FACETS:
+        counts = {}
+        for group in groups:
+            if group[field] is not None and group['count'] and matches(group, skip=field):
+                counts[group[field]] = counts.get(group[field], 0) + group['count']
+        selected = set(selections.get(field) or ())
+        facets[name] = [
+            {'id': row['id'], 'name': row['name'], 'count': counts.get(row['id'], 0), 'selected': row['id'] in selected}
+            for row in taxonomy[taxonomy_key]
+            if row['id'] in counts or row['id'] in selected
+        ]
+
+    # Price bounds ignore the price filter itself so the slider keeps its full range
+    matching = [group for group in groups if matches(group)]
+    facets['price'] = {
+        'min': min((group['min_price'] for group in matching), default=None),
+        'max': max((group['max_price'] for group in matching), default=None),
+    }
+    return facets
+
+
+def _selection_filters(selections):
+    return {f'{field}__in': ids for field, ids in selections.items() if ids}
+
+
+def _price_filter(min_price, max_price):
+    condition = Q()
+    if min_price is not None:
+        condition &= Q(price__gte=min_price)
+    if max_price is not None:
+        condition &= Q(price__lte=max_price)
+    return condition
+
+
+def _stock_filter(in_stock):
+    return {'stock__gt': 0} if in_stock else {}
@@ -0,0 +1,47 @@
+"""
+Per-product feedback aggregates (``ProductFeedbackStats``).
+
+Rows are recomputed from Feedback for the touched products rather than
+patched with deltas, so edits that flip ``is_resolved`` or move feedback to
+another product can't drift the counters.
+"""
+from django.db.models import Count, Max, Q
+
+from .models import Feedback, ProductFeedbackStats
+
+
+def refresh(product_ids):
+    """Recompute the stats rows of the given products (one aggregate query, one upsert)."""
+    product_ids = {product_id for product_id in product_ids if product_id}
+    if not product_ids:
+        return
+    aggregates = {
+        row['product_id']: row
+        for row in Feedback.objects.filter(product_id__in=product_ids).values('product_id').annotate(
+            feedback_count=Count('id'),
+            unresolved_count=Count('id', filter=Q(is_resolved=False)),
+            latest_at=Max('created_at'),
+        ).order_by()
+    }
+    rows = [
+        ProductFeedbackStats(
+            product_id=product_id,
+            feedback_count=aggregates.get(product_id, {}).get('feedback_count', 0),
+            unresolved_count=aggregates.get(product_id, {}).get('unresolved_count', 0),
+            latest_at=aggregates.get(product_id, {}).get('latest_at'),
+        )
+        for product_id in sorted(product_ids)
+    ]
+    ProductFeedbackStats.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['product'],
+        update_fields=['feedback_count', 'unresolved_count', 'latest_at'],
+    )
+
+
+def summary(product):
+    """The product's stats as rendered by the API (select_related('feedback_stats') to avoid a query)."""
+    try:
+        stats = product.feedback_stats
+    except ProductFeedbackStats.DoesNotExist:
+        return {'count': 0, 'unresolved': 0, 'latest_at': None}
+    return {'count': stats.feedback_count, 'unresolved': stats.unresolved_count, 'latest_at': stats.latest_at}
@@ -0,0 +1,53 @@
+from cloudinary import CloudinaryResource
+from cloudinary.models import CloudinaryField
+
+
+class PrecomputedURLCloudinaryField(CloudinaryField):
+    """
+    CloudinaryField that writes the resource's delivery URL into ``url_field``
+    whenever the model is saved (the same way ``width_field``/``height_field``
+    are filled), so serializers never have to build URLs per row.
+
+    ``url_field`` must be declared after this field on the model.
+    """
+
+    def __init__(self, *args, url_field=None, **kwargs):
+        self.url_field = url_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.url_field:
+            kwargs['url_field'] = self.url_field
+        return name, path, args, kwargs
+
+    def delivery_url(self, value):
+        if isinstance(value, str) and value:
+            value = self.parse_cloudinary_resource(value)
+        if isinstance(value, CloudinaryResource) and value:
+            return value.url
+        return ''
+
+    def pre_save(self, model_instance, add):
+        value = super().pre_save(model_instance, add)
+        if self.url_field:
+            setattr(model_instance, self.url_field, self.delivery_url(getattr(model_instance, self.attname)))
+        return value
+
+
+class PrecomputedURLModelMixin:
+    """
+    Model mixin for models with PrecomputedURLCloudinaryFields: a
+    ``save(update_fields=[...])`` that names the image field also writes its
+    URL column, which would otherwise keep the old URL.
+    """
+
+    def save(self, *args, update_fields=None, **kwargs):
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            for field in self._meta.concrete_fields:
+                if isinstance(field, PrecomputedURLCloudinaryField) and field.url_field and (
+                    field.name in update_fields or field.attname in update_fields
+                ):
+                    update_fields.add(field.url_field)
+        super().save(*args, update_fields=update_fields, **kwargs)
@@ -0,0 +1,96 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The first request with a given key claims a row in ``IdempotencyKey`` and runs
+the view in the same transaction, then stores a successful response in the row
+before that transaction commits. The order and the stored response therefore
+commit together or not at all: no crash can leave an order behind a key that
+a retry would treat as unused. Retries with the same key get the response
+replayed after a single lookup. A concurrent duplicate blocks on the unique
+constraint until the first attempt finishes and then replays it. Failed
+attempts roll back their claim so the client can retry.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path} {payload}'.encode()).hexdigest()
+
+
+def _stored(lookup):
+    """The live record for ``lookup``, if any; an expired one is deleted."""
+    record = IdempotencyKey.objects.filter(**lookup).first()
+    if record is not None and record.created_at < timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL):
+        IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+        return None
+    return record
+
+
+def _claim(lookup, fingerprint):
+    """Return ``(record, created)``; must run inside the transaction that will store the response."""
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(request_hash=fingerprint, **lookup), True
+        except IntegrityError:
+            # Claimed by a request that has committed since; it is either live or expired
+            record = _stored(lookup)
+            if record is not None:
+                return record, False
+    return IdempotencyKey.objects.get(**lookup), False
+
+
+def _replay(record, fingerprint):
+    if record.request_hash != fingerprint:
+        return Response({"error": f"{HEADER} was already used with a different request."},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(record.response_body, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view):
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": f"{HEADER} must be at most {MAX_KEY_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        lookup = {'user': request.user, 'endpoint': view.__name__, 'key': key}
+        record = _stored(lookup)
+        if record is not None:
+            return _replay(record, fingerprint)
+
+        with transaction.atomic():
+            record, created = _claim(lookup, fingerprint)
+            if not created:
+                return _replay(record, fingerprint)
+
+            # The view's own transaction nests in this one, so its writes commit with the stored response
+            response = view(request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                record.status_code = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['status_code', 'response_body'])
+            else:
+                transaction.set_rollback(True)  # release the key so the client can retry after fixing the problem
+        return response
+
+    return wrapper
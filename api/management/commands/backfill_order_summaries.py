@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from api.models import Order, OrderItem
+
+
+class Command(BaseCommand):
+    help = "Fill the denormalized item_count/summary/status_name columns of existing orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        lines = OrderItem.objects.select_related('product').only('order_id', 'quantity', 'product__name').order_by('id')
+        orders = Order.objects.select_related('status').prefetch_related(Prefetch('items', queryset=lines)).order_by('pk')
+        last_pk, updated = 0, 0
+        while True:
+            batch = list(orders.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for order in batch:
+                order.set_summary((item.product.name if item.product else '', item.quantity) for item in order.items.all())
+                order.status_name = order.status.name if order.status else ''
+            with transaction.atomic():
+                Order.objects.bulk_update(batch, ['item_count', 'summary', 'status_name'])
+            updated += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} orders."))
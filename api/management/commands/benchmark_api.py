@@ -0,0 +1,57 @@
+import json
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from api.benchmarks import BenchmarkSuite
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark the hot API endpoints (p50/p95/p99 latency and queries per request) and save a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--cold-cache', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help="Only run these scenarios.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Report path (default: benchmarks/<timestamp>.json).")
+
+    def handle(self, *args, **options):
+        try:
+            suite = BenchmarkSuite(iterations=options['iterations'], warmup=options['warmup'],
+                                   cold_cache=options['cold_cache'], seed=options['seed'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        started = timezone.now()
+        # Per-request log lines would drown the report; the suite measures the same numbers itself
+        with override_settings(PERF_LOG_REQUESTS=False):
+            report = suite.run(only=options['endpoints'])
+        report['started_at'] = started.isoformat()
+        report['revision'] = _git_revision()
+
+        self.stdout.write(f"{'endpoint':<24}{'p50':>10}{'p95':>10}{'p99':>10}{'queries':>10}  status")
+        for row in report['results']:
+            latency = row['latency_ms']
+            self.stdout.write(
+                f"{row['endpoint']:<24}{latency['p50']:>10.2f}{latency['p95']:>10.2f}{latency['p99']:>10.2f}"
+                f"{row['queries']['mean']:>10}  {row['status_codes']}"
+            )
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'benchmarks' / f"{started:%Y%m%dT%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
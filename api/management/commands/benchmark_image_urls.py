@@ -0,0 +1,52 @@
+import time
+
+import cloudinary
+from cloudinary import CloudinaryResource
+from django.core.management.base import BaseCommand
+
+from api.models import Brand, Product
+from api.serializers import ProductListSerializer
+
+
+class BuildURLProductListSerializer(ProductListSerializer):
+    # Previous behaviour: build the delivery URL for every row at render time
+    def get_image(self, obj):
+        if obj.image:
+            return obj.image.url
+        return None
+
+
+class Command(BaseCommand):
+    help = "Compare CPU time of rendering product pages with per-row vs precomputed Cloudinary URLs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, page_size, rounds, **options):
+        if not cloudinary.config().cloud_name:
+            cloudinary.config(cloud_name='benchmark')
+
+        brand = Brand(id=1, name='Brand')
+        products = []
+        for i in range(page_size):
+            image = CloudinaryResource(public_id=f'products/sample_{i}', version='1700000000', format='jpg',
+                                       type='upload', resource_type='image')
+            product = Product(id=i + 1, name=f'Product {i}', price='9.99', brand=brand, image=image)
+            product.image_url = image.url
+            products.append(product)
+
+        results = {}
+        for label, serializer_class in (('per-row URL', BuildURLProductListSerializer),
+                                        ('precomputed URL', ProductListSerializer)):
+            serializer_class(products, many=True).data  # warm up
+            start = time.process_time()
+            for _ in range(rounds):
+                serializer_class(products, many=True).data
+            results[label] = (time.process_time() - start) / rounds * 1000
+            self.stdout.write(f"{label:>16}: {results[label]:.3f} ms CPU per {page_size}-row page")
+
+        saved = results['per-row URL'] - results['precomputed URL']
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {saved:.3f} ms CPU per page ({saved / results['per-row URL'] * 100:.1f}%)"
+        ))
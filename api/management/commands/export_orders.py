@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import FORMATS, guess_format, write_rows
+from api.order_export import ORDER_COLUMNS, ExportFilterError, iter_order_rows, order_queryset
+
+
+class Command(BaseCommand):
+    help = "Stream order lines (order, customer email, status, items) to CSV or JSONL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Output file, or - for stdout.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument('--from', dest='date_from', help="Start date (YYYY-MM-DD) or ISO datetime, inclusive.")
+        parser.add_argument('--to', dest='date_to', help="End date (YYYY-MM-DD) or ISO datetime, inclusive.")
+        parser.add_argument('--status', help="Order status name or id.")
+
+    def handle(self, *args, output, date_from, date_to, status, **options):
+        fmt = options['format'] or guess_format(output)
+        try:
+            rows = iter_order_rows(order_queryset(date_from, date_to, status))
+        except ExportFilterError as exc:
+            raise CommandError(str(exc))
+
+        if output == '-':
+            count = write_rows(self.stdout, fmt, ORDER_COLUMNS, rows)
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as stream:
+                count = write_rows(stream, fmt, ORDER_COLUMNS, rows)
+        self.stderr.write(f"Exported {count} order lines.")
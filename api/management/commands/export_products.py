@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.catalog_io import PRODUCT_COLUMNS, iter_product_rows
+from api.exports import FORMATS, guess_format, write_rows
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Stream every product to CSV or JSONL (import_products reads the same layout)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Output file, or - for stdout.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument('--active-only', action='store_true')
+
+    def handle(self, *args, output, active_only, **options):
+        fmt = options['format'] or guess_format(output)
+        queryset = Product.objects.filter(is_active=True) if active_only else Product.objects.all()
+
+        if output == '-':
+            count = write_rows(self.stdout, fmt, PRODUCT_COLUMNS, iter_product_rows(queryset))
+        else:
+            with open(output, 'w', newline='', encoding='utf-8') as stream:
+                count = write_rows(stream, fmt, PRODUCT_COLUMNS, iter_product_rows(queryset))
+        self.stderr.write(f"Exported {count} products.")
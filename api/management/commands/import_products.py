@@ -0,0 +1,40 @@
+import sys
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog_io import ProductImporter, read_rows
+from api.exports import FORMATS, guess_format
+
+
+class Command(BaseCommand):
+    help = "Upsert products by SKU (or id, for rows without one) from a CSV or JSONL file, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or - for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension, else csv.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--create-taxonomy', action='store_true',
+                            help="Create unknown brands/categories/subcategories instead of rejecting the row.")
+
+    def handle(self, *args, path, chunk_size, create_taxonomy, **options):
+        fmt = options['format'] or guess_format(path)
+        try:
+            # stdin isn't ours to close
+            stream = nullcontext(sys.stdin) if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        with stream as lines:
+            importer = ProductImporter(chunk_size=chunk_size, create_taxonomy=create_taxonomy)
+            importer.run(read_rows(lines, fmt))
+
+        for number, message in importer.errors[:50]:
+            self.stderr.write(f"row {number}: {message}")
+        if len(importer.errors) > 50:
+            self.stderr.write(f"... and {len(importer.errors) - 50} more errors")
+        style = self.style.WARNING if importer.errors else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Created {importer.created}, updated {importer.updated}, unchanged {importer.unchanged}, "
+            f"rejected {len(importer.errors)}."
+        ))
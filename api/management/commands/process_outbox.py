@@ -0,0 +1,38 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from api import outbox
+from api.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = "Run the handlers of pending outbox events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running, polling every N seconds when idle (0 = drain once and exit).")
+        parser.add_argument('--prune-days', type=int, default=7,
+                            help="Delete processed events older than N days after each drain (0 = keep).")
+        parser.add_argument('--prune-failed-days', type=int, default=30,
+                            help="Delete failed events older than N days after each drain (0 = keep).")
+
+    def handle(self, *args, batch_size, interval, prune_days, prune_failed_days, **options):
+        while True:
+            totals = [0, 0, 0]
+            while True:
+                counts = outbox.process_batch(batch_size=batch_size)
+                totals = [total + count for total, count in zip(totals, counts)]
+                if sum(counts) < batch_size:
+                    break
+            done, retried, failed = totals
+            self.stdout.write(f"Processed {done} events, {retried} to retry, {failed} failed.")
+            for days, status in ((prune_days, OutboxEvent.DONE), (prune_failed_days, OutboxEvent.FAILED)):
+                pruned = outbox.prune(timedelta(days=days), status=status) if days else 0
+                if pruned:
+                    self.stdout.write(f"Pruned {pruned} {status} events.")
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from api.token_filter import blacklist_filter
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding (and blacklisted) refresh tokens in batches, then rebuild the blacklist filter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, batch_size, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lt=now).order_by('pk').values_list('pk', flat=True)
+        deleted = 0
+        while True:
+            # Short transactions keep locks brief on a large table
+            batch = list(expired[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                OutstandingToken.objects.filter(pk__in=batch).delete()
+            deleted += len(batch)
+
+        blacklist_filter.invalidate()
+        self.stdout.write(f"Deleted {deleted} expired tokens.")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api import feedback_stats
+from api.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute ProductFeedbackStats for every product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+        last_pk, total = 0, 0
+        while True:
+            batch = list(product_ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            feedback_stats.refresh(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f"Refreshed feedback stats for {total} products."))
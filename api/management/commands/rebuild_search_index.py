@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import search
+from api.models import Product, ProductSearchTerm
+
+
+class Command(BaseCommand):
+    help = "Rebuild the product search index from scratch."
+
+    def handle(self, *args, **options):
+        # Searches keep using the old index until the new one commits
+        with transaction.atomic():
+            ProductSearchTerm.objects.all().delete()
+            search.reindex_products(Product.objects.all())
+            transaction.on_commit(search.get_backend().reset)
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {Product.objects.count()} products ({ProductSearchTerm.objects.count()} terms)."
+        ))
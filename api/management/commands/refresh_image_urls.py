@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from api.models import CustomUser, Product
+
+
+class Command(BaseCommand):
+    help = "Recompute stored Cloudinary delivery URLs (after deploying the column or changing Cloudinary config)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        for model, field_name in ((Product, 'image'), (CustomUser, 'profile_picture')):
+            updated = self.refresh(model, field_name, batch_size)
+            self.stdout.write(f"{model.__name__}: {updated} URLs updated")
+
+    def refresh(self, model, field_name, batch_size):
+        field = model._meta.get_field(field_name)
+        url_field = field.url_field
+        queryset = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+        changed = []
+        updated = 0
+        for obj in queryset.only('pk', field_name, url_field).iterator(chunk_size=batch_size):
+            url = field.delivery_url(getattr(obj, field_name))
+            if url != getattr(obj, url_field):
+                setattr(obj, url_field, url)
+                changed.append(obj)
+            if len(changed) >= batch_size:
+                model.objects.bulk_update(changed, [url_field])
+                updated += len(changed)
+                changed = []
+        if changed:
+            model.objects.bulk_update(changed, [url_field])
+            updated += len(changed)
+        return updated
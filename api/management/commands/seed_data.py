@@ -0,0 +1,123 @@
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api import feedback_stats, search
+from api.cache import bump_versions
+from api.models import (Brand, Cart, CartItem, Category, CustomUser, Feedback, Order, OrderItem, OrderStatus,
+                        Product, StoreSetting, SubCategory)
+
+WORDS = [
+    'ultra', 'pro', 'max', 'mini', 'classic', 'smart', 'wireless', 'portable', 'premium', 'eco', 'sport',
+    'compact', 'deluxe', 'lite', 'plus', 'edge', 'air', 'prime', 'neo', 'flex',
+]
+CATEGORY_NAMES = ['Electronics', 'Fashion', 'Home', 'Sports', 'Beauty', 'Toys', 'Books', 'Grocery', 'Garden', 'Auto']
+SUBCATEGORY_NAMES = ['Phone', 'Laptop', 'Shirt', 'Shoes', 'Lamp', 'Chair', 'Ball', 'Racket', 'Cream', 'Puzzle',
+                     'Novel', 'Snack', 'Tool', 'Tyre', 'Watch', 'Camera', 'Bag', 'Desk', 'Bottle', 'Kit']
+STATUS_NAMES = ['Order Received', 'Shipped', 'Delivered', 'Cancelled']
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic catalog, users, carts, orders and feedback with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--subcategories', type=int, default=5, help="Per category.")
+        parser.add_argument('--brands', type=int, default=50)
+        parser.add_argument('--cart-items', type=int, default=3, help="Per user.")
+        parser.add_argument('--orders', type=int, default=5, help="Per user.")
+        parser.add_argument('--order-items', type=int, default=3, help="Per order.")
+        parser.add_argument('--feedback', type=int, default=2, help="Per user.")
+        parser.add_argument('--password', default='benchmark-pass')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        tag = uuid.uuid4().hex[:8]  # keeps emails unique across runs
+
+        with transaction.atomic():
+            statuses = [OrderStatus.objects.get_or_create(name=name)[0] for name in STATUS_NAMES]
+            if not StoreSetting.objects.exists():
+                StoreSetting.objects.create(auto_stock_deduction=True)
+
+            categories = Category.objects.bulk_create([
+                Category(name=f'{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {tag}-{i}') for i in range(options['categories'])
+            ])
+            subcategories = SubCategory.objects.bulk_create([
+                SubCategory(category=category, name=f'{rng.choice(SUBCATEGORY_NAMES)} {j}')
+                for category in categories for j in range(options['subcategories'])
+            ])
+            brands = Brand.objects.bulk_create([
+                Brand(name=f'{rng.choice(WORDS).title()}{i} {tag}') for i in range(options['brands'])
+            ])
+
+            products = []
+            for i in range(options['products']):
+                subcategory = rng.choice(subcategories)
+                products.append(Product(
+                    name=f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {subcategory.name} {i}',
+                    description=' '.join(rng.choice(WORDS) for _ in range(12)),
+                    price=Decimal(rng.randrange(199, 99999)) / 100,
+                    stock=rng.randrange(0, 10_000),
+                    category=subcategory.category,
+                    subcategory=subcategory,
+                    brand=rng.choice(brands),
+                ))
+            products = Product.objects.bulk_create(products, batch_size=BATCH_SIZE)
+
+            password = make_password(options['password'])  # hashing once keeps seeding fast
+            users = CustomUser.objects.bulk_create([
+                CustomUser(email=f'seed-{tag}-{i}@example.com', name=f'Seed User {i}', password=password)
+                for i in range(options['users'])
+            ], batch_size=BATCH_SIZE)
+
+            carts = Cart.objects.bulk_create([Cart(user=user) for user in users], batch_size=BATCH_SIZE)
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product=product, quantity=rng.randint(1, 3))
+                for cart in carts for product in rng.sample(products, min(options['cart_items'], len(products)))
+            ], batch_size=BATCH_SIZE)
+
+            order_lines = []
+            orders = []
+            for user in users:
+                for _ in range(options['orders']):
+                    lines = [(product, rng.randint(1, 3))
+                             for product in rng.sample(products, min(options['order_items'], len(products)))]
+                    status = rng.choice(statuses)
+                    order = Order(
+                        user=user,
+                        total_price=sum(product.price * quantity for product, quantity in lines),
+                        status=status,
+                        status_name=status.name,
+                    )
+                    order.set_summary((product.name, quantity) for product, quantity in lines)
+                    orders.append(order)
+                    order_lines.append(lines)
+            orders = Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+                for order, lines in zip(orders, order_lines) for product, quantity in lines
+            ], batch_size=BATCH_SIZE)
+
+            Feedback.objects.bulk_create([
+                Feedback(user=user, product=rng.choice(products), message=' '.join(rng.choice(WORDS) for _ in range(8)),
+                         is_resolved=rng.random() < 0.5)
+                for user in users for _ in range(options['feedback'])
+            ], batch_size=BATCH_SIZE)
+
+        # Bulk inserts skip the signals that maintain the search index and feedback stats
+        search.reindex_products(Product.objects.filter(pk__in=[product.pk for product in products]))
+        feedback_stats.refresh(product.pk for product in products)
+        bump_versions(['products', 'taxonomy', 'stock'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded run '{tag}': {len(users)} users (password '{options['password']}'), {len(products)} products, "
+            f"{len(orders)} orders."
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import reservations
+
+
+class Command(BaseCommand):
+    help = "Reclaim expired cart stock reservations."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=int, default=0,
+                            help="Keep running, sweeping every N seconds (0 = sweep once and exit).")
+
+    def handle(self, *args, batch_size, interval, **options):
+        while True:
+            removed = reservations.sweep(batch_size=batch_size)
+            self.stdout.write(f"Removed {removed} expired reservations.")
+            if not interval:
+                break
+            time.sleep(interval)
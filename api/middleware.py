@@ -0,0 +1,108 @@
+import json
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+
+from . import db_router, perf
+from .cache import is_shared_cache
+
+logger = logging.getLogger('api.perf')
+
+
+class PerformanceMiddleware:
+    """
+    Records total, SQL, auth, serializer (``serialize``) and response rendering
+    (``render``, DRF's JSON encoding) time plus the query count of every
+    request, and reports them as a ``Server-Timing`` header and/or one JSON
+    log line on the ``api.perf`` logger. Disabled entirely (not even
+    installed) when ``PERF_INSTRUMENTATION`` is off.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERF_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = perf.begin()
+        try:
+            response = self.get_response(request)
+            return self.report(request, response, perf.current())
+        finally:
+            perf.end(token)
+
+    async def __acall__(self, request):
+        token = perf.begin()
+        try:
+            response = await self.get_response(request)
+            return self.report(request, response, perf.current())
+        finally:
+            perf.end(token)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (encoded) after the view returns; time that step separately
+        metrics = perf.current()
+        if metrics is not None:
+            start = perf_counter()
+            response.add_post_render_callback(lambda rendered: metrics.add('render', perf_counter() - start))
+        return response
+
+    def report(self, request, response, metrics):
+        total = metrics.total
+        timings = {'db': metrics.db_time, **metrics.timings, 'total': total}
+        if settings.PERF_SERVER_TIMING:
+            entries = [f'db;desc="{metrics.db_queries} queries";dur={metrics.db_time * 1000:.1f}']
+            entries += [f'{name};dur={seconds * 1000:.1f}' for name, seconds in metrics.timings.items()]
+            entries.append(f'total;dur={total * 1000:.1f}')
+            response['Server-Timing'] = ', '.join(entries)
+        if settings.PERF_LOG_REQUESTS:
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'db_queries': metrics.db_queries,
+                **{f'{name}_ms': round(seconds * 1000, 2) for name, seconds in timings.items()},
+            }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Opens the per-request read-replica routing state (see api.db_router); not installed without replicas."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        if not is_shared_cache():
+            raise ImproperlyConfigured("Read replicas need a shared cache backend: read-your-writes pins live there.")
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = db_router.begin(request)
+        try:
+            return self.get_response(request)
+        finally:
+            db_router.end(token)
+
+    async def __acall__(self, request):
+        token = db_router.begin(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            db_router.end(token)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:39
+
+import api.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_product_recency_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_picture_url',
+            field=models.URLField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_url',
+            field=models.URLField(blank=True, default='', editable=False, max_length=500),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='profile_picture',
+            field=api.fields.PrecomputedURLCloudinaryField(blank=True, max_length=255, null=True, url_field='profile_picture_url', verbose_name='profile_picture'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=api.fields.PrecomputedURLCloudinaryField(blank=True, max_length=255, null=True, url_field='image_url', verbose_name='product_image'),
+        ),
+    ]
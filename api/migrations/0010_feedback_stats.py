@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_order_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductFeedbackStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='feedback_stats', serialize=False, to='api.product')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('unresolved_count', models.PositiveIntegerField(default=0)),
+                ('latest_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['product', '-created_at', '-id'], name='feedback_product_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='feedback_user_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+"""
+Fill the columns and tables that earlier migrations added empty, so an existing database serves correct
+order statuses, search results, feedback counts and image URLs as soon as it is migrated. The matching
+management commands (backfill_order_summaries, rebuild_search_index, rebuild_feedback_stats,
+refresh_image_urls) redo the same work later if needed.
+"""
+from django.db import migrations
+from django.db.models import Count, Max, Prefetch, Q
+
+from api import search
+from api.models import Order as LiveOrder
+
+BATCH_SIZE = 1000
+
+
+def batches(queryset):
+    last_pk = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        yield batch
+
+
+def backfill_orders(apps, schema_editor):
+    Order = apps.get_model('api', 'Order')
+    OrderItem = apps.get_model('api', 'OrderItem')
+    lines = OrderItem.objects.select_related('product').order_by('id')
+    orders = Order.objects.select_related('status').prefetch_related(Prefetch('items', queryset=lines))
+    summary = LiveOrder()  # set_summary is model code, which historical models don't have
+    for batch in batches(orders):
+        for order in batch:
+            summary.set_summary((item.product.name if item.product else '', item.quantity) for item in order.items.all())
+            order.item_count, order.summary = summary.item_count, summary.summary
+            order.status_name = order.status.name if order.status else ''
+        Order.objects.bulk_update(batch, ['item_count', 'summary', 'status_name'])
+
+
+def backfill_search_index(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    ProductSearchTerm = apps.get_model('api', 'ProductSearchTerm')
+    ProductSearchTerm.objects.all().delete()
+    for batch in batches(Product.objects.select_related('brand', 'category', 'subcategory')):
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(product_id=product.pk, term=term, weight=weight)
+            for product in batch
+            for term, weight in search.product_terms(product).items()
+        ], batch_size=BATCH_SIZE)
+
+
+def backfill_feedback_stats(apps, schema_editor):
+    Feedback = apps.get_model('api', 'Feedback')
+    ProductFeedbackStats = apps.get_model('api', 'ProductFeedbackStats')
+    ProductFeedbackStats.objects.all().delete()
+    aggregates = Feedback.objects.exclude(product_id=None).values('product_id').annotate(
+        feedback_count=Count('id'),
+        unresolved_count=Count('id', filter=Q(is_resolved=False)),
+        latest_at=Max('created_at'),
+    ).order_by('product_id')
+    ProductFeedbackStats.objects.bulk_create(
+        (ProductFeedbackStats(**row) for row in aggregates.iterator(chunk_size=BATCH_SIZE)), batch_size=BATCH_SIZE,
+    )
+
+
+def backfill_image_urls(apps, schema_editor):
+    for model_name, field_name in (('Product', 'image'), ('CustomUser', 'profile_picture')):
+        model = apps.get_model('api', model_name)
+        field = model._meta.get_field(field_name)
+        queryset = model.objects.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+        for batch in batches(queryset.only('pk', field_name, field.url_field)):
+            for obj in batch:
+                setattr(obj, field.url_field, field.delivery_url(getattr(obj, field_name)))
+            model.objects.bulk_update(batch, [field.url_field])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_outbox_events'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_orders, migrations.RunPython.noop),
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+        migrations.RunPython(backfill_feedback_stats, migrations.RunPython.noop),
+        migrations.RunPython(backfill_image_urls, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
-from cloudinary.models import CloudinaryField
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from .fields import PrecomputedURLCloudinaryField, PrecomputedURLModelMixin
 
 
 class CustomUserManager(BaseUserManager):
@@ -19,16 +21,18 @@ class CustomUserManager(BaseUserManager):
         extra_fields.setdefault("is_superuser", True)
         return self.create_user(email, password, **extra_fields)
 
-class CustomUser(AbstractBaseUser, PermissionsMixin):
+class CustomUser(PrecomputedURLModelMixin, AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
     name = models.CharField(max_length=255)
     phone = models.CharField(max_length=15, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
-    profile_picture = CloudinaryField(
+    profile_picture = PrecomputedURLCloudinaryField(
     'profile_picture',
     blank=True,
-    null=True
+    null=True,
+    url_field='profile_picture_url'
 )  # ✅ NEW FIELD
+    profile_picture_url = models.URLField(max_length=500, blank=True, default='', editable=False)  # filled on save
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -61,27 +65,56 @@ class Brand(models.Model):
     def __str__(self):
         return self.name
 
-class Product(models.Model):
+class Product(PrecomputedURLModelMixin, models.Model):
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # stable key for bulk import/export
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = CloudinaryField(
+    image = PrecomputedURLCloudinaryField(
     'product_image',
     blank=True,
-    null=True
+    null=True,
+    url_field='image_url'
 )
+    image_url = models.URLField(max_length=500, blank=True, default='', editable=False)  # filled on save
 
     stock = models.IntegerField(default=0)
-    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
-    subcategory = models.ForeignKey(SubCategory, on_delete=models.SET_NULL, null=True)
-    brand = models.ForeignKey(Brand, on_delete=models.SET_NULL, null=True)
+    # FK lookups are served by the composite *_recency_idx indexes below
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, db_index=False)
+    subcategory = models.ForeignKey(SubCategory, on_delete=models.SET_NULL, null=True, db_index=False)
+    brand = models.ForeignKey(Brand, on_delete=models.SET_NULL, null=True, db_index=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order (see api.pagination.KeysetPagination)
+            models.Index(fields=['-created_at', '-id'], name='product_recency_idx'),
+            # Category/brand/subcategory listings: equality on the group, newest first
+            models.Index(fields=['category', '-created_at', '-id'], name='product_category_recency_idx'),
+            models.Index(fields=['brand', '-created_at', '-id'], name='product_brand_recency_idx'),
+            models.Index(fields=['subcategory', '-created_at', '-id'], name='product_subcat_recency_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ProductSearchTerm(models.Model):
+    # Inverted index row: one per (product, term), maintained by api.search
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64, db_index=True)
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'term'], name='unique_product_search_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.product_id} ({self.weight})"
+
+
 
 class Cart(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='cart')
@@ -91,17 +124,39 @@ class Cart(models.Model):
         return f"Cart of {self.user.email}"
 
 class CartItem(models.Model):
-    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items', db_index=False)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     added_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # cart.items and the (cart, product) lookups of add-to-cart and batch updates
+            models.Index(fields=['cart', 'product'], name='cartitem_cart_product_idx'),
+        ]
+
     def __str__(self):
         return f"{self.quantity} x {self.product.name} in {self.cart.user.email}'s cart"
 
     def get_total_price(self):
         return self.quantity * self.product.price
 
+class StockReservation(models.Model):
+    # TTL hold on product stock for a cart line (see api.reservations)
+    cart_item = models.OneToOneField(CartItem, on_delete=models.CASCADE, related_name='reservation')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_active_idx'),
+            models.Index(fields=['expires_at'], name='reservation_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x product {self.product_id} until {self.expires_at}"
+
 class OrderStatus(models.Model):
     name = models.CharField(max_length=50, unique=True)  # e.g., Pending, Shipped, Delivered, Cancelled
 
@@ -109,13 +164,42 @@ class OrderStatus(models.Model):
         return self.name
 
 class Order(models.Model):
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='orders')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='orders', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
-    status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True)  # or choices=('Pending', 'Shipped', etc.)
+    # or choices=('Pending', 'Shipped', etc.); filtered through order_status_created_idx
+    status = models.ForeignKey(OrderStatus, on_delete=models.SET_NULL, null=True, db_index=False)
+    # Denormalized for order history listings, which then never touch OrderItem or OrderStatus
+    item_count = models.PositiveIntegerField(default=0)
+    summary = models.CharField(max_length=255, blank=True, default='')
+    status_name = models.CharField(max_length=50, blank=True, default='')  # kept in sync by api.signals
+
+    SUMMARY_NAMES = 3
+
+    class Meta:
+        indexes = [
+            # Date-range and status filters of the finance export (api.order_export)
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            # Order history (user_orders_view), newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_recency_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} by {self.user.email}"
+
+    def set_summary(self, lines):
+        """Fill item_count/summary from (product_name, quantity) pairs, e.g. "Phone, Case +2 more"."""
+        names, count = [], 0
+        for name, quantity in lines:
+            count += quantity
+            if name and name not in names:
+                names.append(name)
+        summary = ', '.join(names[:self.SUMMARY_NAMES])
+        if len(names) > self.SUMMARY_NAMES:
+            summary += f' +{len(names) - self.SUMMARY_NAMES} more'
+        self.item_count = count
+        self.summary = summary if len(summary) <= 255 else summary[:254] + '…'
     
 
 class OrderItem(models.Model):
@@ -129,6 +213,49 @@ class OrderItem(models.Model):
 
 
 
+class IdempotencyKey(models.Model):
+    # First successful response for a client-supplied Idempotency-Key (see api.idempotency)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    endpoint = models.CharField(max_length=100)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # set before the claim commits
+    response_body = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.status_code or 'pending'})"
+
+
+class OutboxEvent(models.Model):
+    # Side effect recorded in the same transaction as the change that caused it (see api.outbox)
+    PENDING, DONE, FAILED = 'pending', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, encoder=JSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed back after each failed attempt
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's queue scan (api.outbox.process_batch)
+            models.Index(fields=['status', 'available_at', 'id'], name='outbox_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
+
+
 class StoreSetting(models.Model):
     auto_stock_deduction = models.BooleanField(default=False)
 
@@ -141,11 +268,30 @@ class StoreSetting(models.Model):
 
 
 class Feedback(models.Model):
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='feedbacks')
+    # FK lookups are served by the composite feed indexes below
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='feedbacks', db_index=False)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_resolved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Keyset-paginated feeds (newest first) per product and per user
+            models.Index(fields=['product', '-created_at', '-id'], name='feedback_product_feed_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='feedback_user_feed_idx'),
+        ]
+
     def __str__(self):
         return f"Feedback by {self.user.email} on {self.product.name}"
+
+
+class ProductFeedbackStats(models.Model):
+    # Per-product aggregate of Feedback, maintained by api.signals (see api.feedback_stats)
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='feedback_stats')
+    feedback_count = models.PositiveIntegerField(default=0)
+    unresolved_count = models.PositiveIntegerField(default=0)
+    latest_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.feedback_count} feedback on product #{self.product_id}"
@@ -0,0 +1,114 @@
+"""
+Transactional outbox.
+
+``publish(topic, payload)`` writes an OutboxEvent in the caller's transaction,
+so the event exists if and only if the change that caused it committed. The
+``process_outbox`` command (run it continuously, e.g. ``--interval 5``) drains
+pending events in batches, off the request path.
+
+A batch is claimed in a short transaction: the rows are locked with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so several workers can run side by
+side, and leased by moving ``available_at`` OUTBOX_LEASE_SECONDS ahead. The
+claim then commits and every handler runs in its own transaction, so a slow
+handler holds no locks on the queue. A worker that dies mid-batch leaves its
+events to be picked up again when the lease runs out, so handlers must be
+idempotent. A failing handler is retried with exponential backoff until
+OUTBOX_MAX_ATTEMPTS, then the event is parked as failed.
+
+Handlers register per topic with ``@handler(topic)``.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}  # topic -> function(payload)
+
+
+def handler(topic):
+    def register(function):
+        _handlers[topic] = function
+        return function
+    return register
+
+
+def publish(topic, payload=None):
+    """Record an event in the current transaction; the worker runs its handler after commit."""
+    return OutboxEvent.objects.create(topic=topic, payload=payload or {})
+
+
+def backoff(attempts):
+    """Delay before retry number ``attempts``: exponential with jitter, capped at OUTBOX_BACKOFF_MAX."""
+    delay = min(settings.OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.OUTBOX_BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim(batch_size=100):
+    """Lease up to ``batch_size`` due events to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.PENDING, available_at__lte=now)
+            .order_by('available_at', 'id')[:batch_size]
+        )
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            available_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS),
+        )
+    return events
+
+
+def run(event):
+    """Run one event's handler; returns the event's new status."""
+    function = _handlers.get(event.topic)
+    try:
+        if function is None:
+            raise LookupError(f"No outbox handler registered for {event.topic!r}")
+        with transaction.atomic():
+            function(event.payload)
+            # Marked done in the handler's transaction, so its writes and the status commit together
+            OutboxEvent.objects.filter(pk=event.pk).update(status=OutboxEvent.DONE, processed_at=timezone.now())
+        return OutboxEvent.DONE
+    except Exception as exc:
+        logger.warning("Outbox handler for %s failed: %s", event.topic, exc, exc_info=True)
+        now = timezone.now()
+        attempts = event.attempts + 1
+        changes = {'attempts': attempts, 'last_error': f'{type(exc).__name__}: {exc}'}
+        if attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            changes.update(status=OutboxEvent.FAILED, processed_at=now)
+        else:
+            changes.update(available_at=now + backoff(attempts))
+        OutboxEvent.objects.filter(pk=event.pk).update(**changes)
+        return changes.get('status', OutboxEvent.PENDING)
+
+
+def process_batch(batch_size=100):
+    """Claim and run up to ``batch_size`` due events; returns (done, retried, failed)."""
+    counts = {OutboxEvent.DONE: 0, OutboxEvent.PENDING: 0, OutboxEvent.FAILED: 0}
+    for event in claim(batch_size):
+        counts[run(event)] += 1
+    return counts[OutboxEvent.DONE], counts[OutboxEvent.PENDING], counts[OutboxEvent.FAILED]
+
+
+def prune(older_than, status=OutboxEvent.DONE):
+    """Delete events finished (done or failed) more than ``older_than`` (a timedelta) ago; returns how many."""
+    cutoff = timezone.now() - older_than
+    return OutboxEvent.objects.filter(status=status, processed_at__lt=cutoff).delete()[0]
+
+
+# Handlers
+
+events_logger = logging.getLogger('api.events')
+
+
+@handler('order.placed')
+def record_order_placed(payload):
+    # Hook for notifications/analytics; for now one structured line on the api.events logger
+    events_logger.info("order.placed %s", payload)
@@ -1,12 +1,174 @@
+import base64
+import binascii
+import json
 
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class ProductPagination(PageNumberPagination):
     page_size = 10  # Default items per page
     page_size_query_param = 'page_size'  # Allow user to override page size
     max_page_size = 100
+    ordering = ('-created_at', '-id')  # newest first, as the cursor pages are; served by the *_recency_idx indexes
+
+    def order(self, queryset):
+        # Only unordered querysets: search results come ranked
+        if isinstance(queryset, QuerySet) and not queryset.ordered:
+            return queryset.order_by(*self.ordering)
+        return queryset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return super().paginate_queryset(self.order(queryset), request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views: same pages, links and errors, on the async ORM."""
+        queryset = self.order(queryset)
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()  # a cached_property, so the paginator doesn't count again
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        offset = (number - 1) * page_size
+        self.page = Page([row async for row in queryset[offset:offset + page_size]], number, paginator)
+        return list(self.page)
 
 class UserOrdersPagination(PageNumberPagination):
     page_size = 3  # Default items per page
     page_size_query_param = 'page_size'  # Allow user to override page size
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a stable (created_at, id) ordering, newest first.
+
+    Each page is a single indexed range query: no OFFSET and no COUNT(*).
+    Cursors are opaque tokens holding the boundary row's (created_at, id).
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_field = 'created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self.page_range(queryset, request)
+        return self.finish_page(list(queryset[:self.page_size + 1]), position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, position, reverse = self.page_range(queryset, request)
+        return self.finish_page([row async for row in queryset[:self.page_size + 1]], position, reverse)
+
+    def page_range(self, queryset, request):
+        """Order and bound ``queryset`` for the requested page; returns ``(queryset, position, reverse)``."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+
+        field = self.ordering_field
+        if position is None:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+            reverse = False
+        else:
+            value, pk, reverse = position
+            if reverse:
+                boundary = Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                queryset = queryset.filter(boundary).order_by(field, 'pk')
+            else:
+                boundary = Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                queryset = queryset.filter(boundary).order_by(f'-{field}', '-pk')
+        return queryset, position, reverse
+
+    def finish_page(self, rows, position, reverse):
+        # One extra row tells us whether another page exists in that direction
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = rows[-1]
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = rows[0]
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+            value = parse_datetime(payload['v'])
+            pk = int(payload['id'])
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, reverse
+
+    def encode_cursor(self, row, reverse):
+        payload = {'v': getattr(row, self.ordering_field).isoformat(), 'id': row.pk}
+        if reverse:
+            payload['r'] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii')).decode('ascii')
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class ProductCursorPagination(KeysetPagination):
+    """Keyset pagination for product listings (?pagination=cursor)."""
+
+
+class FeedbackPagination(KeysetPagination):
+    page_size = 20
+
+
+def wants_cursor(request):
+    # ?pagination=cursor (or any cursor token) opts into keyset paging
+    return request.query_params.get('pagination') == 'cursor' or bool(request.query_params.get('cursor'))
+
+
+def get_product_paginator(request):
+    # Page numbers by default
+    if wants_cursor(request):
+        return ProductCursorPagination()
+    return ProductPagination()
@@ -0,0 +1,116 @@
+"""
+Per-request performance metrics.
+
+``PerformanceMiddleware`` (api.middleware) opens a ``RequestMetrics`` for each
+request in a context variable. Code that wants its time accounted for wraps
+itself in ``timer(name)``. SQL is timed by a wrapper installed once on every
+database connection, and the output of the API's serializers (``.data``) by
+``TimedSerializerMixin``. Outside a request everything here is a no-op.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.serializers import LIST_SERIALIZER_KWARGS, LIST_SERIALIZER_KWARGS_REMOVE, ListSerializer
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+        self.serializing = False
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @property
+    def total(self):
+        return perf_counter() - self.start
+
+
+def current():
+    return _current.get()
+
+
+def begin():
+    return _current.set(RequestMetrics())
+
+
+def end(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(name, perf_counter() - start)
+
+
+def db_timer(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+@receiver(connection_created)
+def install_db_timer(sender, connection, **kwargs):
+    if db_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_timer)
+
+
+class TimedSerializerMixin:
+    """
+    Times top-level ``.data`` as ``serialize`` (nested serializers count toward
+    their parent). ``many=True`` gets a timed ListSerializer as well, unless the
+    serializer declares its own ``list_serializer_class``.
+    """
+
+    @property
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return super().data
+        metrics.serializing = True
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics.serializing = False
+            metrics.add('serialize', perf_counter() - start)
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if hasattr(getattr(cls, 'Meta', None), 'list_serializer_class'):
+            return super().many_init(*args, **kwargs)
+        # DRF's many_init, with TimedListSerializer as the default list class
+        list_kwargs = {}
+        for key in LIST_SERIALIZER_KWARGS_REMOVE:
+            value = kwargs.pop(key, None)
+            if value is not None:
+                list_kwargs[key] = value
+        list_kwargs['child'] = cls(*args, **kwargs)
+        list_kwargs.update({key: value for key, value in kwargs.items() if key in LIST_SERIALIZER_KWARGS})
+        return TimedListSerializer(*args, **list_kwargs)
+
+
+class TimedListSerializer(TimedSerializerMixin, ListSerializer):
+    pass
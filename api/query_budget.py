@@ -0,0 +1,71 @@
+"""
+Query budgets for views.
+
+``@query_budget(n)`` declares how many SQL queries a view body may run. Going
+over budget raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_STRICT`` is on
+(DEBUG and tests) and logs a warning otherwise, so N+1 regressions surface
+before they reach production. ``assert_max_queries`` is the same check for an
+arbitrary block of code.
+"""
+import functools
+import logging
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+def check_budget(label, count, limit, strict=None):
+    if count <= limit:
+        return
+    message = f"{label} ran {count} queries, budget is {limit}"
+    if strict is None:
+        strict = getattr(settings, 'QUERY_BUDGET_STRICT', settings.DEBUG)
+    if strict:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+@contextmanager
+def assert_max_queries(limit, label='block'):
+    with count_queries() as counter:
+        yield counter
+    check_budget(label, counter.count, limit, strict=True)
+
+
+def query_budget(limit):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with count_queries() as counter:
+                response = view(request, *args, **kwargs)
+            check_budget(view.__name__, counter.count, limit)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
@@ -0,0 +1,74 @@
+"""
+Time-bounded stock reservations for cart lines.
+
+Adding to the cart places a hold (``StockReservation``) for the line's full
+quantity that expires after ``CART_RESERVATION_TTL`` seconds. Available to
+sell is ``stock`` minus the quantity held by other users' active holds.
+Expired holds are ignored by every query, so the sweeper only reclaims rows;
+it is not needed for correctness. At checkout a line covered by an active
+hold is already known to fit in stock, so only lines whose hold lapsed are
+checked against the product again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import StockReservation
+
+
+def reserved_quantities(product_ids, exclude_user_id=None):
+    """``{product_id: quantity}`` held by active reservations, optionally ignoring one user's cart."""
+    holds = StockReservation.objects.filter(product_id__in=list(product_ids), expires_at__gt=timezone.now())
+    if exclude_user_id is not None:
+        holds = holds.exclude(cart_item__cart__user_id=exclude_user_id)
+    return dict(holds.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+def available_to_sell(product, exclude_user_id=None):
+    return product.stock - reserved_quantities([product.id], exclude_user_id).get(product.id, 0)
+
+
+def hold(cart_items):
+    """Create or refresh the reservation of each (saved) cart item for its current quantity."""
+    expires_at = timezone.now() + timedelta(seconds=settings.CART_RESERVATION_TTL)
+    existing = {
+        reservation.cart_item_id: reservation
+        for reservation in StockReservation.objects.filter(cart_item__in=[item.id for item in cart_items])
+    }
+    to_create, to_update = [], []
+    for item in cart_items:
+        reservation = existing.get(item.id)
+        if reservation is None:
+            to_create.append(StockReservation(
+                cart_item_id=item.id, product_id=item.product_id, quantity=item.quantity, expires_at=expires_at,
+            ))
+        else:
+            reservation.quantity = item.quantity
+            reservation.expires_at = expires_at
+            to_update.append(reservation)
+    StockReservation.objects.bulk_create(to_create)
+    StockReservation.objects.bulk_update(to_update, ['quantity', 'expires_at'])
+
+
+def covers(cart_item, now=None):
+    """Whether the cart item's quantity is still fully held (use select_related('reservation'))."""
+    try:
+        reservation = cart_item.reservation
+    except StockReservation.DoesNotExist:
+        return False
+    return reservation.expires_at > (now or timezone.now()) and reservation.quantity >= cart_item.quantity
+
+
+def sweep(batch_size=1000):
+    """Delete expired reservations in batches; returns how many were removed."""
+    removed = 0
+    while True:
+        expired = list(
+            StockReservation.objects.filter(expires_at__lte=timezone.now())
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not expired:
+            return removed
+        removed += StockReservation.objects.filter(pk__in=expired).delete()[0]
@@ -0,0 +1,285 @@
+"""
+Product search index.
+
+Every product is tokenized into (term, weight) pairs over its name, brand,
+subcategory, category and description, stored in ``ProductSearchTerm`` and
+kept up to date by the signal handlers in ``api.signals``.
+
+Two backends answer queries from that index:
+
+* ``DatabaseSearchBackend`` aggregates matching index rows in SQL (the
+  default; ``term`` is served by a b-tree/pattern index).
+* ``MemorySearchBackend`` keeps an inverted index in process memory, loaded
+  once from the table and patched incrementally by the process that writes.
+  Other processes don't see those writes until they restart, so it is only
+  for a single process (the default with DEBUG on SQLite).
+
+Every query term must match (the last one as a prefix, so results follow the
+user while typing) and products are ranked by the summed field weights.
+``search_results`` returns the ranking lazily: with the database backend it is
+a queryset, so pagination counts and slices it in SQL instead of loading
+every matching id.
+"""
+import bisect
+import re
+import threading
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Max, Q, Sum, When
+
+from .models import Product, ProductSearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+REINDEX_CHUNK_SIZE = 500
+
+# Higher weight = stronger signal that the product is what the user wants
+FIELD_WEIGHTS = (
+    ('name', 8),
+    ('brand', 4),
+    ('subcategory', 3),
+    ('category', 2),
+    ('description', 1),
+)
+MAX_OCCURRENCES_PER_FIELD = 3
+
+
+def tokenize(text):
+    return [term for term in TOKEN_RE.findall((text or '').casefold()) if len(term) <= MAX_TERM_LENGTH]
+
+
+def product_terms(product):
+    """Return ``{term: weight}`` for a product (brand/category/subcategory should be select_related)."""
+    values = {
+        'name': product.name,
+        'description': product.description,
+        'brand': product.brand.name if product.brand_id else '',
+        'category': product.category.name if product.category_id else '',
+        'subcategory': product.subcategory.name if product.subcategory_id else '',
+    }
+    terms = {}
+    for field, field_weight in FIELD_WEIGHTS:
+        counts = {}
+        for term in tokenize(values[field]):
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            terms[term] = terms.get(term, 0) + field_weight * min(count, MAX_OCCURRENCES_PER_FIELD)
+    return terms
+
+
+def parse_query(query):
+    """Split a query into exact terms and a trailing prefix term."""
+    terms = tokenize(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return [], None
+    return terms[:-1], terms[-1]
+
+
+class DatabaseSearchBackend:
+    def search(self, query, limit=None):
+        return list(self.ranked(query)[:limit])
+
+    def ranked(self, query):
+        """Matching product ids, best first, as a queryset (``count()`` and slices run in SQL)."""
+        exact, prefix = parse_query(query)
+        if prefix is None:
+            return []
+
+        conditions = [Q(term=term) for term in exact] + [Q(term__startswith=prefix)]
+        # One flag per query term so that only products matching all of them survive the HAVING clause
+        flags = {
+            f'match_{i}': Max(Case(When(condition, then=1), default=0, output_field=IntegerField()))
+            for i, condition in enumerate(conditions)
+        }
+        rows = (
+            ProductSearchTerm.objects
+            .filter(reduce(or_, conditions))
+            .values('product_id')
+            .annotate(score=Sum('weight'), **flags)
+            .filter(**{name: 1 for name in flags})
+            .order_by('-score', '-product_id')
+        )
+        return rows.values_list('product_id', flat=True)
+
+    def update(self, product_id, terms):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+    def reset(self):
+        pass
+
+
+class MemorySearchBackend:
+    """Per-process inverted index; lazily loaded from ProductSearchTerm."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._postings = None  # term -> {product_id: weight}
+        self._product_terms = {}  # product_id -> tuple of terms
+        self._vocabulary = None  # sorted terms, rebuilt lazily for prefix lookups
+
+    def _ensure_loaded(self):
+        if self._postings is not None:
+            return
+        postings = {}
+        product_terms = {}
+        rows = ProductSearchTerm.objects.values_list('term', 'product_id', 'weight').iterator(chunk_size=5000)
+        for term, product_id, weight in rows:
+            postings.setdefault(term, {})[product_id] = weight
+            product_terms.setdefault(product_id, []).append(term)
+        self._postings = postings
+        self._product_terms = {product_id: tuple(terms) for product_id, terms in product_terms.items()}
+        self._vocabulary = None
+
+    def _prefix_terms(self, prefix):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = start
+        while end < len(self._vocabulary) and self._vocabulary[end].startswith(prefix):
+            end += 1
+        return self._vocabulary[start:end]
+
+    def search(self, query, limit=None):
+        return self.ranked(query)[:limit]
+
+    def ranked(self, query):
+        exact, prefix = parse_query(query)
+        if prefix is None:
+            return []
+
+        with self._lock:
+            self._ensure_loaded()
+            scores = None
+            for term in exact:
+                scores = self._intersect(scores, self._postings.get(term, {}))
+                if not scores:
+                    return []
+            prefix_scores = {}
+            for term in self._prefix_terms(prefix):
+                for product_id, weight in self._postings[term].items():
+                    prefix_scores[product_id] = prefix_scores.get(product_id, 0) + weight
+            scores = self._intersect(scores, prefix_scores)
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return [product_id for product_id, _ in ranked]
+
+    @staticmethod
+    def _intersect(scores, postings):
+        if scores is None:
+            return dict(postings)
+        return {product_id: score + postings[product_id] for product_id, score in scores.items() if product_id in postings}
+
+    def update(self, product_id, terms):
+        with self._lock:
+            if self._postings is None:
+                return  # not loaded yet, the next load reads the table
+            self._remove(product_id)
+            for term, weight in terms.items():
+                if term not in self._postings:
+                    self._vocabulary = None
+                self._postings.setdefault(term, {})[product_id] = weight
+            self._product_terms[product_id] = tuple(terms)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._postings is not None:
+                self._remove(product_id)
+
+    def _remove(self, product_id):
+        for term in self._product_terms.pop(product_id, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                self._vocabulary = None
+
+    def reset(self):
+        with self._lock:
+            self._reset_state()
+
+
+BACKENDS = {
+    'database': DatabaseSearchBackend,
+    'memory': MemorySearchBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'PRODUCT_SEARCH_BACKEND', '') or (
+                    'memory' if settings.DEBUG and connection.vendor == 'sqlite' else 'database'
+                )
+                _backend = BACKENDS[name]()
+    return _backend
+
+
+def search_product_ids(query, limit=None):
+    """Return ids of (up to ``limit``) products matching ``query``, best match first."""
+    return get_backend().search(query, limit=limit)
+
+
+def search_results(query):
+    """Ids of the products matching ``query``, best first, as a sequence to count and slice (e.g. paginate)."""
+    return get_backend().ranked(query)
+
+
+def reindex_products(queryset):
+    """(Re)build index rows for every product in ``queryset``."""
+    queryset = queryset.select_related('brand', 'category', 'subcategory').order_by('pk')
+    last_pk = 0
+    while True:
+        products = list(queryset.filter(pk__gt=last_pk)[:REINDEX_CHUNK_SIZE])
+        if not products:
+            break
+        last_pk = products[-1].pk
+        _write_terms({product.pk: product_terms(product) for product in products})
+
+
+def index_product(product):
+    _write_terms({product.pk: product_terms(product)})
+
+
+def _write_terms(terms_by_product):
+    with transaction.atomic():
+        ProductSearchTerm.objects.filter(product_id__in=list(terms_by_product)).delete()
+        ProductSearchTerm.objects.bulk_create([
+            ProductSearchTerm(product_id=product_id, term=term, weight=weight)
+            for product_id, terms in terms_by_product.items()
+            for term, weight in terms.items()
+        ], batch_size=1000)
+
+    def update_backend():
+        backend = get_backend()
+        for product_id, terms in terms_by_product.items():
+            backend.update(product_id, terms)
+
+    transaction.on_commit(update_backend)
+
+
+def unindex_product(product_id):
+    # Index rows go away with the product through the FK cascade
+    transaction.on_commit(lambda: get_backend().remove(product_id))
+
+
+def products_referencing(instance):
+    """Products whose index text includes the given Brand/Category/SubCategory."""
+    field = {'Brand': 'brand', 'Category': 'category', 'SubCategory': 'subcategory'}[type(instance).__name__]
+    return Product.objects.filter(**{field: instance})
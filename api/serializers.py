@@ -1,6 +1,19 @@
 from rest_framework import serializers
 from .models import CustomUser,Product,Order,OrderItem,OrderStatus,Category,SubCategory,Brand,Feedback,CartItem
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from . import feedback_stats
+from .perf import TimedSerializerMixin
+from .token_filter import FilteredRefreshToken
+
+
+def precomputed_url(obj, field_name):
+    # Delivery URLs are stored at save time (PrecomputedURLCloudinaryField); only
+    # rows saved before that column existed fall back to building the URL here.
+    url = getattr(obj, f'{field_name}_url')
+    if url:
+        return url
+    resource = getattr(obj, field_name)
+    return resource.url if resource else None
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
@@ -34,6 +47,11 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         attrs['username'] = attrs.get('email')
         return super().validate(attrs)
 
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    # Blacklist lookups go through api.token_filter first (SIMPLE_JWT['TOKEN_REFRESH_SERIALIZER'])
+    token_class = FilteredRefreshToken
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=6)
     profile_picture = serializers.ImageField(required=False, allow_null=True)
@@ -70,7 +88,22 @@ class AddToCartSerializer(serializers.Serializer):
         return value
     
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class CartOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=['add', 'set', 'remove'])
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, required=False, default=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == 'add' and attrs['quantity'] < 1:
+            raise serializers.ValidationError({"quantity": "Must be at least 1 for add."})
+        return attrs
+
+
+class CartBatchSerializer(serializers.Serializer):
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=100)
+    
+
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     profile_picture = serializers.SerializerMethodField()
 
     class Meta:
@@ -79,9 +112,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['email']
 
     def get_profile_picture(self, obj):
-        if obj.profile_picture:
-            return obj.profile_picture.url  # 👈 FULL Cloudinary URL
-        return None
+        return precomputed_url(obj, 'profile_picture')  # 👈 FULL Cloudinary URL
 
 
 
@@ -92,7 +123,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['product', 'quantity', 'price']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     status = serializers.PrimaryKeyRelatedField(queryset=OrderStatus.objects.all())
 
@@ -107,7 +138,7 @@ class OrderSerializer(serializers.ModelSerializer):
     
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     brand = serializers.CharField(source='brand.name')
     image = serializers.SerializerMethodField()
 
@@ -116,25 +147,23 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'price', 'image', 'brand']
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url  # 👈 FULL Cloudinary URL
-        return None
+        return precomputed_url(obj, 'image')  # 👈 FULL Cloudinary URL
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name'] 
 
 
-class SubCategorySerializer(serializers.ModelSerializer):
+class SubCategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     category = serializers.StringRelatedField()  # or use CategorySerializer if needed
 
     class Meta:
         model = SubCategory
         fields = ['id', 'name', 'category']
 
-class BrandSerializer(serializers.ModelSerializer):
+class BrandSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Brand
         fields = ['id', 'name']
@@ -147,10 +176,11 @@ class CreateFeedbackSerializer(serializers.ModelSerializer):
         fields = ['product', 'message']
 
 
-class FeedbackSerializer(serializers.ModelSerializer):
-    user = serializers.StringRelatedField(read_only=True)
-    user_id = serializers.IntegerField(source='user.id', read_only=True)
-    product = serializers.StringRelatedField(read_only=True)
+class FeedbackSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Plain columns from the joined rows (see FEEDBACK_FEED_FIELDS), no per-row lookups
+    user = serializers.CharField(source='user.email', read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
+    product = serializers.CharField(source='product.name', read_only=True)
 
     class Meta:
         model = Feedback
@@ -159,11 +189,12 @@ class FeedbackSerializer(serializers.ModelSerializer):
 
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     brand = serializers.StringRelatedField()
     category = serializers.StringRelatedField()
     subcategory = serializers.StringRelatedField()
     image = serializers.SerializerMethodField()  # 👈 FIX
+    feedback = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
@@ -177,12 +208,14 @@ class ProductDetailSerializer(serializers.ModelSerializer):
             'category',
             'subcategory',
             'stock',
+            'feedback',
         ]
 
     def get_image(self, obj):
-        if obj.image:
-            return obj.image.url  # 👈 Full Cloudinary URL
-        return None
+        return precomputed_url(obj, 'image')  # 👈 Full Cloudinary URL
+
+    def get_feedback(self, obj):
+        return feedback_stats.summary(obj)  # maintained aggregate, no Feedback scan
 
 class OrderItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -191,16 +224,24 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['product_name', 'quantity', 'price']
 
-class OrderTrackSerializer(serializers.ModelSerializer):
+class OrderTrackSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True) 
-    status = serializers.CharField(source='status.name', read_only=True)  # <-- this uses 'items' not 'orderitem_set'
+    status = serializers.CharField(source='status_name', read_only=True)  # denormalized, no OrderStatus join
 
     class Meta:
         model = Order
         fields = ['id', 'created_at', 'total_price', 'status', 'items']
 
 
-class CartItemSerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    status = serializers.CharField(source='status_name', read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created_at', 'total_price', 'status', 'item_count', 'summary']
+
+
+class CartItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     product_id = serializers.IntegerField(source='product.id', read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
@@ -220,9 +261,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         ]
 
     def get_product_image(self, obj):
-        if obj.product.image:
-            return obj.product.image.url  # 👈 FULL Cloudinary URL
-        return None
+        return precomputed_url(obj.product, 'image')  # 👈 FULL Cloudinary URL
 
     def get_subtotal(self, obj):
         return obj.quantity * obj.product.price
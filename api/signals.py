@@ -0,0 +1,216 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from . import db_router, feedback_stats, search
+from .authentication import forget_user_active
+from .cache import bump_versions, product_namespaces
+from .store_config import config_cache
+from .taxonomy import taxonomy_cache
+from .token_filter import blacklist_filter
+from .models import (Brand, Category, CustomUser, Feedback, Order, OrderStatus, Product, StoreSetting,
+                     SubCategory)
+
+
+@receiver(post_save, sender=Product)
+def index_saved_product(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_deleted_product(sender, instance, **kwargs):
+    search.unindex_product(instance.pk)
+
+
+@receiver(pre_save, sender=Brand)
+@receiver(pre_save, sender=Category)
+@receiver(pre_save, sender=SubCategory)
+def remember_taxonomy_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if instance.pk and not raw:
+        instance._previous_name = sender.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+def reindex_renamed_taxonomy(sender, instance, created=False, raw=False, **kwargs):
+    # Only the name is indexed; other edits leave every product's terms as they are
+    if raw or created or getattr(instance, '_previous_name', None) == instance.name:
+        return
+    search.reindex_products(search.products_referencing(instance))
+
+
+@receiver(pre_delete, sender=Brand)
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=SubCategory)
+def remember_taxonomy_products(sender, instance, **kwargs):
+    # The FK is nulled out before post_delete, so collect the affected products now
+    instance._search_product_ids = list(search.products_referencing(instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def reindex_orphaned_products(sender, instance, **kwargs):
+    product_ids = getattr(instance, '_search_product_ids', None)
+    if product_ids:
+        search.reindex_products(Product.objects.filter(pk__in=product_ids))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=SubCategory)
+def invalidate_taxonomy(sender, **kwargs):
+    db_router.pin_catalog()
+    taxonomy_cache.invalidate()
+
+
+PRODUCT_GROUP_FIELDS = ('category_id', 'brand_id', 'subcategory_id')
+
+
+def invalidate_catalog(namespaces):
+    # Pinned first so that nothing is cached under the new versions from a lagging replica
+    db_router.pin_catalog()
+    bump_versions(namespaces)
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_groups(sender, instance, raw=False, **kwargs):
+    # A product moved to another category/brand must leave the old listings too
+    instance._previous_groups = None
+    if instance.pk and not raw:
+        instance._previous_groups = Product.objects.filter(pk=instance.pk).values(*PRODUCT_GROUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_responses(sender, instance, **kwargs):
+    current = {field: getattr(instance, field) for field in PRODUCT_GROUP_FIELDS}
+    # The product's feedback feed shows its name
+    namespaces = product_namespaces(current, getattr(instance, '_previous_groups', None)) | {f'feedback:{instance.pk}'}
+    invalidate_catalog(namespaces)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(pre_delete, sender=Brand)
+def invalidate_brand_responses(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    # The brand name is rendered in every listing its products appear in
+    groups = Product.objects.filter(brand=instance).values('category_id', 'subcategory_id').distinct()
+    invalidate_catalog(product_namespaces({'brand_id': instance.pk}, *groups))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+@receiver(post_save, sender=SubCategory)
+@receiver(pre_delete, sender=SubCategory)
+def invalidate_group_responses(sender, instance, created=False, **kwargs):
+    if created:
+        return
+    field = 'category' if sender is Category else 'subcategory'
+    invalidate_catalog([f'{field}:{instance.pk}'])
+
+
+@receiver(pre_save, sender=Order)
+def sync_order_status_name(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # instance.status is normally cached from the assignment, so this rarely queries
+    instance.status_name = instance.status.name if instance.status_id else ''
+
+
+@receiver(post_save, sender=OrderStatus)
+def rename_order_status(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    Order.objects.filter(status=instance).exclude(status_name=instance.name).update(status_name=instance.name)
+
+
+@receiver(pre_delete, sender=OrderStatus)
+def clear_order_status_name(sender, instance, **kwargs):
+    # The FK is set to NULL on delete; the denormalized name has to follow
+    Order.objects.filter(status=instance).update(status_name='')
+
+
+@receiver(pre_save, sender=Feedback)
+def remember_feedback_product(sender, instance, raw=False, **kwargs):
+    # Editing can move feedback to another product; both products' stats change
+    instance._previous_product_id = None
+    if instance.pk and not raw:
+        previous = Feedback.objects.filter(pk=instance.pk).values_list('product_id', flat=True)
+        instance._previous_product_id = previous.first()
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(post_delete, sender=Feedback)
+def refresh_feedback_stats(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or isinstance(origin, Product):
+        return  # the product (and its stats row) is being deleted
+    product_ids = {instance.product_id, getattr(instance, '_previous_product_id', None)}
+    feedback_stats.refresh(product_ids)
+    # Bump only: pinning the whole catalog on every feedback write would keep reads off the replicas.
+    # The author's own reads are pinned by the write, other readers may briefly see the replica's copy.
+    bump_versions(f'feedback:{product_id}' for product_id in product_ids if product_id)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_user_email(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._previous_email = instance.email
+    if instance.pk and not raw and (update_fields is None or 'email' in update_fields):
+        instance._previous_email = CustomUser.objects.filter(pk=instance.pk).values_list('email', flat=True).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_feedback_feeds(sender, instance, created=False, raw=False, **kwargs):
+    # Feedback feeds show the author's email
+    if created or raw or getattr(instance, '_previous_email', instance.email) == instance.email:
+        return
+    product_ids = Feedback.objects.filter(user=instance).values_list('product_id', flat=True).distinct()
+    bump_versions(f'feedback:{product_id}' for product_id in product_ids)  # bump only, as for feedback writes
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user_state(sender, instance, **kwargs):
+    # Deactivation must reach StatelessJWTAuthentication before the TTL runs out
+    forget_user_active(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def invalidate_blacklist_filter(sender, created=False, **kwargs):
+    # Deletions only leave stale bits (harmless); prune_tokens rebuilds once per run
+    if created:
+        blacklist_filter.invalidate()
+
+
+@receiver(post_save, sender=StoreSetting)
+@receiver(post_delete, sender=StoreSetting)
+@receiver(post_save, sender=OrderStatus)
+@receiver(post_delete, sender=OrderStatus)
+def invalidate_store_config(sender, **kwargs):
+    config_cache.invalidate()
+
+
+def products_bulk_saved(products, previous_groups=(), reindex=True):
+    """
+    Run the Product post_save work for rows written with bulk_create/bulk_update,
+    which don't send model signals. ``previous_groups`` holds the category/brand/
+    subcategory ids of updated rows before the write; ``reindex`` can be turned
+    off when no indexed text changed.
+    """
+    if not products:
+        return
+    if reindex:
+        search.reindex_products(Product.objects.filter(pk__in=[product.pk for product in products]))
+    current = [{field: getattr(product, field) for field in PRODUCT_GROUP_FIELDS} for product in products]
+    namespaces = product_namespaces(*current, *previous_groups)
+    if reindex:  # names may have changed, and feedback feeds show them
+        namespaces.update(f'feedback:{product.pk}' for product in products)
+    invalidate_catalog(namespaces)
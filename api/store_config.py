@@ -0,0 +1,43 @@
+"""
+Store configuration (StoreSetting, OrderStatus) held in memory per worker.
+
+Checkout reads these rows on every order but they almost never change, so they
+are loaded together and served from memory until a save or delete bumps the
+``store_config`` namespace (see ``api.signals``). Every read checks the
+namespace version in the shared cache, so a renamed status or a changed
+setting is used by every worker from the first read after it commits. Writes
+that send no signals (queryset updates, raw SQL) don't bump it; each copy is
+also reloaded after STORE_CONFIG_MAX_AGE seconds, which bounds their staleness.
+"""
+from django.conf import settings
+
+from .cache import VersionedLocalCache
+from .models import OrderStatus, StoreSetting
+
+DEFAULT_ORDER_STATUS = 'Order Received'
+
+
+def load_config():
+    setting = StoreSetting.objects.order_by('pk').first()
+    return {
+        'auto_stock_deduction': bool(setting and setting.auto_stock_deduction),
+        'order_statuses': dict(OrderStatus.objects.values_list('name', 'pk')),
+    }
+
+
+config_cache = VersionedLocalCache('store_config', load_config, max_age=settings.STORE_CONFIG_MAX_AGE)
+
+
+def auto_stock_deduction():
+    return config_cache.get()['auto_stock_deduction']
+
+
+def order_status(name=DEFAULT_ORDER_STATUS):
+    """The OrderStatus called ``name``, as a fresh instance built from the cached id (no query)."""
+    pk = config_cache.get()['order_statuses'].get(name)
+    if pk is None:
+        # Created or renamed since this copy was loaded: ask the database (raises DoesNotExist if it's gone)
+        return OrderStatus.objects.get(name=name)
+    status = OrderStatus(pk=pk, name=name)
+    status._state.adding = False
+    return status
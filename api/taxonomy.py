@@ -0,0 +1,35 @@
+"""
+Catalog taxonomy (categories, subcategories, brands) held in memory per worker.
+
+The whole taxonomy is a few hundred rows that change rarely, so it is loaded
+in three queries and served from memory until a Category, SubCategory or
+Brand change bumps the ``taxonomy`` namespace (see ``api.signals``).
+"""
+from .cache import VersionedLocalCache
+from .models import Brand, Category, SubCategory
+
+
+def load_taxonomy():
+    categories = list(Category.objects.order_by('id').values('id', 'name'))
+    category_names = {category['id']: category['name'] for category in categories}
+
+    subcategories = []
+    tree = {category['id']: {**category, 'subcategories': []} for category in categories}
+    for row in SubCategory.objects.order_by('id').values('id', 'name', 'category_id'):
+        # Same shape as SubCategorySerializer: category rendered by name
+        subcategories.append({'id': row['id'], 'name': row['name'], 'category': category_names.get(row['category_id'])})
+        tree[row['category_id']]['subcategories'].append({'id': row['id'], 'name': row['name']})
+
+    return {
+        'categories': categories,
+        'subcategories': subcategories,
+        'brands': list(Brand.objects.order_by('id').values('id', 'name')),
+        'tree': list(tree.values()),
+    }
+
+
+taxonomy_cache = VersionedLocalCache('taxonomy', load_taxonomy)
+
+
+def get_taxonomy():
+    return taxonomy_cache.get()
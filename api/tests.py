@@ -1,3 +1,1381 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+import cloudinary
+
+from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import CharField, Value
+from django.db.models.functions import Concat
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import db_router, outbox, perf, reservations, search, store_config
+from .authentication import StatelessJWTAuthentication, forget_user_active
+from .cache import (VersionedLocalCache, get_version, is_coherent_cache, is_shared_cache, shared_cache_check,
+                    warn_incoherent_cache)
+from .benchmarks import BenchmarkSuite, percentile
+from .db_router import ReplicaRouter
+from .middleware import ReplicaRoutingMiddleware
+from .models import (Brand, Cart, CartItem, Category, CustomUser, Feedback, IdempotencyKey, Order, OrderItem,
+                     OrderStatus, OutboxEvent, Product, ProductFeedbackStats, ProductSearchTerm, StockReservation,
+                     StoreSetting, SubCategory)
+from .query_budget import QueryBudgetExceeded, assert_max_queries, query_budget
+from .search import DatabaseSearchBackend, MemorySearchBackend, search_product_ids
+from .serializers import ProductDetailSerializer, ProductListSerializer
+from .token_filter import NAMESPACE, BloomFilter, _load_filter, might_be_blacklisted
+
+
+class CatalogFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='buyer@example.com', password='secret123', name='Buyer')
+        cls.category = Category.objects.create(name='Electronics')
+        cls.subcategory = SubCategory.objects.create(category=cls.category, name='Phone')
+        cls.brands = [Brand.objects.create(name=f'Brand {i}') for i in range(3)]
+        cls.products = [
+            Product.objects.create(
+                name=f'Phone {i}', description='A phone', price=100 + i, stock=50,
+                category=cls.category, subcategory=cls.subcategory, brand=cls.brands[i % 3],
+            )
+            for i in range(15)
+        ]
+        status = OrderStatus.objects.create(name='Order Received')
+        cart = Cart.objects.create(user=cls.user)
+        for product in cls.products[:5]:
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+        for _ in range(5):
+            order = Order.objects.create(user=cls.user, total_price=300, status=status)
+            for product in cls.products[:3]:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+        for product in cls.products[:5] + [cls.products[0]] * 5:
+            Feedback.objects.create(user=cls.user, product=product, message='Nice')
+
+    perf_log = False  # keep the per-request JSON log lines out of the test output
+
+    def setUp(self):
+        cache.clear()
+        # Tests run in one process, where the local-memory cache is coherent
+        self.enterContext(override_settings(PERF_LOG_REQUESTS=self.perf_log, CACHE_ALLOW_LOCAL=True))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class SearchTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.lens = Product.objects.create(name='Zoom lens', description='Clip-on optics', price=50,
+                                           category=self.category, brand=self.brands[0])
+        self.tripod = Product.objects.create(name='Tripod', description='Steady zoom shots', price=30,
+                                             category=self.category, brand=self.brands[1])
+
+    def test_backends_rank_the_same(self):
+        for backend in (DatabaseSearchBackend(), MemorySearchBackend()):
+            with self.subTest(type(backend).__name__):
+                self.assertEqual(backend.search('zoo'), [self.lens.id, self.tripod.id])  # name outranks description
+                self.assertEqual(backend.search('zoom len'), [self.lens.id])  # every term must match
+                self.assertEqual(backend.search('ZOOM  shots'), [self.tripod.id])
+                self.assertEqual(backend.search('zoom', limit=1), [self.lens.id])
+                self.assertEqual(backend.search('  '), [])
+
+    def test_result_count_is_not_capped(self):
+        gadgets = Product.objects.bulk_create([
+            Product(name=f'Gadget {i}', description='', price=1, brand=self.brands[0]) for i in range(1005)
+        ])
+        search.reindex_products(Product.objects.filter(pk__in=[gadget.pk for gadget in gadgets]))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/search-products/?q=gadget&page_size=5&page=201')
+        self.assertEqual(response.data['count'], 1005)
+        self.assertEqual(len(response.data['results']), 5)
+        # Counted and paged in SQL, not by loading all 1005 ids
+        index_queries = [query['sql'] for query in queries if 'api_productsearchterm' in query['sql']]
+        self.assertEqual(len(index_queries), 2)
+        self.assertIn('COUNT(', index_queries[0])
+        self.assertIn('LIMIT 5 OFFSET 1000', index_queries[1])
+
+    def test_taxonomy_reindexed_only_on_rename(self):
+        brand = self.brands[0]
+        with mock.patch('api.signals.search.reindex_products') as reindex:
+            brand.save()
+        reindex.assert_not_called()
+
+        brand.name = 'Acme'
+        brand.save()
+        self.assertEqual(set(search_product_ids('acme')), {self.lens.id, *(p.id for p in self.products[::3])})
+
+    def test_rebuild_is_atomic(self):
+        terms = ProductSearchTerm.objects.count()
+        with mock.patch('api.search.reindex_products', side_effect=RuntimeError('boom')), \
+                self.assertRaises(RuntimeError):
+            call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(ProductSearchTerm.objects.count(), terms)
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(ProductSearchTerm.objects.count(), terms)
+
+
+class KeysetPaginationTests(CatalogFixtureMixin, TestCase):
+    url = '/api/products/?pagination=cursor&page_size=4'
+
+    def walk(self, url, link='next'):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages, response.data
+
+    def test_pages_through_ties_on_created_at(self):
+        Product.objects.filter(pk__in=[p.pk for p in self.products[3:12]]).update(created_at=self.products[3].created_at)
+        pages, last = self.walk(self.url)
+        expected = list(Product.objects.order_by('-created_at', '-pk').values_list('pk', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 3])
+        self.assertIsNone(last['next'])
+
+    def test_previous_link_returns_to_earlier_pages(self):
+        Product.objects.update(created_at=self.products[0].created_at)
+        first = self.client.get(self.url).data
+        self.assertIsNone(first['previous'])
+        forward, last = self.walk(self.url)
+        backward, first_again = self.walk(last['previous'], link='previous')
+        self.assertEqual(backward, forward[-2::-1])
+        self.assertEqual(first_again['results'], first['results'])
+        self.assertIsNotNone(first_again['next'])
+
+    def test_invalid_or_forged_cursor(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(payload.encode()).decode()
+
+        for cursor in ['abc', token('not json'), token('{"v": "2024-01-01T00:00:00"}'),
+                       token('{"v": "yesterday", "id": 1}'), token('{"v": null, "id": 1}'),
+                       token('{"v": "2024-01-01T00:00:00", "id": "1; drop"}'), token('[]'), '%%%']:
+            with self.subTest(cursor):
+                self.assertEqual(self.client.get(f'{self.url}&cursor={cursor}').status_code, 404)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(CatalogFixtureMixin, TestCase):
+    """Every list endpoint must stay within its declared @query_budget."""
+
+    def assert_ok(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return response
+
+    def test_product_listings(self):
+        for url in [
+            '/api/products/?page_size=15',
+            '/api/products/?pagination=cursor&page_size=15',
+            f'/api/products/category/{self.category.id}/',
+            f'/api/products/brand/{self.brands[0].id}/',
+            f'/api/products/subcategory/{self.subcategory.id}/',
+            f'/api/products/by-category-ids/?ids={self.category.id}',
+            '/api/products/by-brand-ids/?ids=' + ','.join(str(brand.id) for brand in self.brands),
+            f'/api/products/by-subcategory-ids/?ids={self.subcategory.id}',
+            '/api/search-products/?q=phone',
+            f'/api/products/filter/?category_ids={self.category.id}&in_stock=true',
+            f'/api/products/{self.products[0].id}/',
+        ]:
+            self.assert_ok(url)
+
+    def test_taxonomy(self):
+        for url in ['/api/categories/', '/api/subcategories/', '/api/brands/']:
+            self.assert_ok(url)
+
+    def test_user_views(self):
+        response = self.assert_ok('/api/my-orders/?page_size=100')
+        self.assertEqual(len(response.data['results'][0]['items']), 3)
+        self.assertEqual(len(self.assert_ok('/api/my-cart/').data), 5)
+        self.assert_ok('/api/feedback/my/')
+        self.assert_ok(f'/api/feedback/product/{self.products[0].id}/')
+
+    def test_budget_violation_raises(self):
+        @query_budget(1)
+        def chatty_view(request):
+            return [product.brand.name for product in Product.objects.all()]
+
+        with self.assertRaises(QueryBudgetExceeded):
+            chatty_view(None)
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(1):
+            list(Product.objects.select_related('brand'))
+        with self.assertRaises(QueryBudgetExceeded):
+            with assert_max_queries(1):
+                [product.brand.name for product in Product.objects.all()]
+
+
+class TaxonomyCacheTests(CatalogFixtureMixin, TestCase):
+    def test_full_tree(self):
+        response = self.client.get('/api/categories/?full=true')
+        self.assertEqual(response.data, [{
+            'id': self.category.id, 'name': 'Electronics',
+            'subcategories': [{'id': self.subcategory.id, 'name': 'Phone'}],
+        }])
+
+    def test_served_from_memory_until_changed(self):
+        self.client.get('/api/brands/')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/brands/').data['count'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Brand.objects.create(name='Brand 3')
+        self.assertEqual(self.client.get('/api/brands/').data['count'], 4)
+
+
+class ResponseCacheTests(CatalogFixtureMixin, TestCase):
+    def test_hit_after_miss_with_normalized_ids(self):
+        first = self.client.get(f'/api/products/by-brand-ids/?ids={self.brands[1].id},{self.brands[0].id}')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(f'/api/products/by-brand-ids/?ids={self.brands[0].id},{self.brands[1].id}')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+    def test_product_change_invalidates_only_its_namespaces(self):
+        product = self.products[0]
+        other_brand = self.brands[1]
+        self.client.get(f'/api/products/brand/{product.brand_id}/')
+        self.client.get(f'/api/products/brand/{other_brand.id}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Renamed'
+            product.save()
+
+        self.assertEqual(self.client.get(f'/api/products/brand/{product.brand_id}/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(f'/api/products/brand/{other_brand.id}/')['X-Cache'], 'HIT')
+
+    def test_brand_rename_invalidates_listings(self):
+        self.client.get('/api/products/?page_size=15')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.brands[0].name = 'Renamed'
+            self.brands[0].save()
+        response = self.client.get('/api/products/?page_size=15')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Renamed', {row['brand'] for row in response.data['results']})
+
+    def test_process_local_cache_needs_single_process_opt_in(self):
+        # Invalidations never leave a LocMemCache process, so caching responses in it must be an explicit choice
+        with override_settings(CACHE_ALLOW_LOCAL=False):
+            self.assertFalse(is_coherent_cache())
+            self.assertEqual([error.id for error in shared_cache_check(None)], ['api.E001'])
+            warn_incoherent_cache.cache_clear()
+            with self.assertLogs('api.cache', 'WARNING'):
+                self.client.get('/api/products/')
+            response = self.client.get('/api/products/')
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('X-Cache', response)
+        self.assertTrue(is_coherent_cache())
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=redis, CACHE_ALLOW_LOCAL=False):
+            self.assertTrue(is_shared_cache())
+            self.assertEqual(shared_cache_check(None), [])
+
+    def test_dummy_cache_means_cache_off(self):
+        dummy = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        loads = []
+        local = VersionedLocalCache('dummy-test', lambda: len(loads.append(1) or loads))
+        # Nothing is cached, so nothing can go stale: every read loads afresh
+        with override_settings(CACHES=dummy, CACHE_ALLOW_LOCAL=False), mock.patch('api.cache.cache', DummyCache('', {})):
+            self.assertEqual((local.get(), local.get()), (1, 2))
+            self.assertEqual(shared_cache_check(None), [])
+
+
+class ImageURLTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.enterContext(mock.patch.object(cloudinary.config(), 'cloud_name', 'demo'))
+        self.product = self.products[0]
+
+    def test_urls_filled_on_create(self):
+        product = Product.objects.create(name='Camera', description='A camera', price=10,
+                                         image='image/upload/v1/camera.jpg')
+        self.assertEqual(product.image_url, 'http://res.cloudinary.com/demo/image/upload/v1/camera.jpg')
+        user = CustomUser.objects.create_user(email='pic@example.com', password='secret123', name='Pic',
+                                              profile_picture='image/upload/v1/me.png')
+        user.refresh_from_db()
+        self.assertEqual(user.profile_picture_url, 'http://res.cloudinary.com/demo/image/upload/v1/me.png')
+
+    def test_url_follows_image_on_update(self):
+        self.product.image = 'image/upload/v2/new.jpg'
+        self.product.save()
+        self.assertTrue(self.product.image_url.endswith('/v2/new.jpg'))
+
+        self.product.image = 'image/upload/v3/newer.jpg'
+        self.product.save(update_fields=['image'])
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.image_url.endswith('/v3/newer.jpg'))
+
+        self.product.image = None
+        self.product.save(update_fields=['image'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_url, '')
+
+    def test_refresh_image_urls(self):
+        self.product.image = 'image/upload/v1/phone.jpg'
+        self.product.save()
+        Product.objects.filter(pk=self.product.pk).update(image_url='http://stale.example/phone.jpg')
+        out = io.StringIO()
+        call_command('refresh_image_urls', stdout=out)
+        self.assertIn('Product: 1 URLs updated', out.getvalue())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_url, 'http://res.cloudinary.com/demo/image/upload/v1/phone.jpg')
+        call_command('refresh_image_urls', stdout=out)
+        self.assertIn('Product: 0 URLs updated', out.getvalue())
+
+
+class ProductFilterTests(CatalogFixtureMixin, TestCase):
+    def test_results_and_disjunctive_facet_counts(self):
+        brand = self.brands[0]
+        response = self.client.get(f'/api/products/filter/?brand_ids={brand.id}&min_price=103&page_size=50')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({row['brand'] for row in response.data['results']}, {brand.name})
+        self.assertEqual(response.data['count'], 4)  # prices 103, 106, 109, 112
+
+        facets = response.data['facets']
+        # Other brands keep their counts so the user can widen the selection
+        self.assertEqual(
+            [(row['id'], row['count'], row['selected']) for row in facets['brands']],
+            [(brand.id, 4, True), (self.brands[1].id, 4, False), (self.brands[2].id, 4, False)],
+        )
+        self.assertEqual(facets['categories'], [{'id': self.category.id, 'name': 'Electronics', 'count': 4, 'selected': False}])
+        self.assertEqual((facets['price']['min'], facets['price']['max']), (100, 112))
+
+    def test_invalid_price(self):
+        self.assertEqual(self.client.get('/api/products/filter/?min_price=abc').status_code, 400)
+        for value in ('NaN', 'sNaN', 'Infinity', '-inf'):
+            with self.subTest(value):
+                self.assertEqual(self.client.get(f'/api/products/filter/?max_price={value}').status_code, 400)
+
+
+class CartBatchTests(CatalogFixtureMixin, TestCase):
+    def test_applies_operations_in_one_request(self):
+        in_cart, new, removed = self.products[0], self.products[10], self.products[1]
+        operations = [
+            {'op': 'add', 'product_id': in_cart.id, 'quantity': 2},
+            {'op': 'set', 'product_id': new.id, 'quantity': 4},
+            {'op': 'add', 'product_id': new.id, 'quantity': 1},
+            {'op': 'remove', 'product_id': removed.id},
+        ]
+        with self.assertNumQueries(14):  # independent of the number of operations
+            response = self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        quantities = {row['product_id']: row['quantity'] for row in response.data['items']}
+        self.assertEqual(quantities[in_cart.id], 3)
+        self.assertEqual(quantities[new.id], 5)
+        self.assertNotIn(removed.id, quantities)
+
+    def test_rejects_whole_batch_on_stock_error(self):
+        operations = [
+            {'op': 'set', 'product_id': self.products[0].id, 'quantity': 2},
+            {'op': 'add', 'product_id': self.products[1].id, 'quantity': 500},
+        ]
+        response = self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CartItem.objects.get(cart__user=self.user, product=self.products[0]).quantity, 1)
+
+    def test_lines_can_shrink_after_stock_drops_below_them(self):
+        CartItem.objects.filter(cart__user=self.user, product=self.products[1]).update(quantity=3)
+        Product.objects.filter(pk=self.products[0].pk).update(stock=0)
+        Product.objects.filter(pk=self.products[1].pk).update(stock=1)
+        operations = [
+            {'op': 'remove', 'product_id': self.products[0].id},
+            {'op': 'set', 'product_id': self.products[1].id, 'quantity': 2},
+        ]
+        response = self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 200)
+        quantities = {row['product_id']: row['quantity'] for row in response.data['items']}
+        self.assertNotIn(self.products[0].id, quantities)
+        self.assertEqual(quantities[self.products[1].id], 2)
+
+        operations = [{'op': 'add', 'product_id': self.products[1].id, 'quantity': 1}]
+        response = self.client.post('/api/cart/batch/', {'operations': operations}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CheckoutTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.setting = StoreSetting.objects.create(auto_stock_deduction=True)
+        self.cart_items = list(CartItem.objects.filter(cart__user=self.user).order_by('product_id'))
+        store_config.auto_stock_deduction()  # warm the config cache
+
+    def fill_cart(self, count):
+        cart = self.user.cart
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=2) for product in self.products[5:count]])
+
+    def test_query_count_does_not_grow_with_cart(self):
+        with self.assertNumQueries(13):
+            self.assertEqual(self.client.post('/api/place-order/').status_code, 201)
+        self.fill_cart(15)
+        with self.assertNumQueries(13):
+            self.assertEqual(self.client.post('/api/place-order/').status_code, 201)
+        self.assertEqual(Order.objects.latest('id').items.count(), 10)
+        self.products[5].refresh_from_db()
+        self.assertEqual(self.products[5].stock, 48)
+
+    def test_reports_every_shortage(self):
+        CartItem.objects.filter(pk__in=[item.pk for item in self.cart_items[:2]]).update(quantity=60)
+        response = self.client.post('/api/place-order/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([(row['product_id'], row['requested'], row['available']) for row in response.data['items']],
+                         [(self.products[0].id, 60, 50), (self.products[1].id, 60, 50)])
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 5)
+
+    def test_stock_not_enforced_without_deduction(self):
+        self.setting.auto_stock_deduction = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.setting.save()
+        CartItem.objects.filter(pk=self.cart_items[0].pk).update(quantity=60)
+        self.assertEqual(self.client.post('/api/place-order/').status_code, 201)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 50)
+
+    def test_failed_deduction_rolls_back_the_order(self):
+        # Holds skip the re-check, so only the conditional UPDATE notices stock that vanished meanwhile
+        reservations.hold(self.cart_items)
+        Product.objects.filter(pk=self.products[2].pk).update(stock=0)
+        response = self.client.post('/api/place-order/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 5)
+        self.assertEqual(set(Product.objects.filter(pk__in=[p.pk for p in self.products[:5]])
+                             .values_list('stock', flat=True)), {0, 50})
+
+
+class IdempotencyTests(CatalogFixtureMixin, TestCase):
+    def test_retry_replays_first_order(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'order-1'}
+        first = self.client.post('/api/place-order/', **headers)
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):
+            retry = self.client.post('/api/place-order/', **headers)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 6)
+
+    def test_failed_attempt_releases_key(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'buy-1'}
+        product = self.products[0]
+        self.assertEqual(self.client.post('/api/buy-now/', {'product_id': product.id, 'quantity': 500}, **headers).status_code, 400)
+        self.assertEqual(self.client.post('/api/buy-now/', {'product_id': product.id, 'quantity': 500}, **headers).status_code, 400)
+        self.assertEqual(self.client.post('/api/buy-now/', {'product_id': product.id, 'quantity': 1}, **headers).status_code, 201)
+
+    def test_key_reuse_with_different_body(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'buy-2'}
+        self.client.post('/api/buy-now/', {'product_id': self.products[0].id}, **headers)
+        response = self.client.post('/api/buy-now/', {'product_id': self.products[1].id}, **headers)
+        self.assertEqual(response.status_code, 422)
+
+    def test_crash_before_response_is_stored_leaves_no_order(self):
+        # The process dies after the order is written but before the response is stored
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'order-crash'}
+        save = IdempotencyKey.save
+
+        def die_on_store(record, *args, update_fields=None, **kwargs):
+            if update_fields:
+                self.assertEqual(Order.objects.filter(user=self.user).count(), 6)  # the order was written
+                raise SystemExit
+            return save(record, *args, **kwargs)
+
+        with mock.patch.object(IdempotencyKey, 'save', die_on_store), self.assertRaises(SystemExit):
+            self.client.post('/api/place-order/', **headers)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 5)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 5)
+
+        self.assertEqual(self.client.post('/api/place-order/', **headers).status_code, 201)
+        self.assertEqual(self.client.post('/api/place-order/', **headers)['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 6)
+
+class StockReservationTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.create(name='Flash sale', description='Limited', price=10, stock=3,
+                                              category=self.category, brand=self.brands[0])
+        self.other = CustomUser.objects.create_user(email='other@example.com', password='secret123', name='Other')
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other)
+
+    def add(self, client, quantity):
+        return client.post('/api/cart/add/', {'product_id': self.product.id, 'quantity': quantity})
+
+    def test_holds_block_other_carts_until_expired(self):
+        self.assertEqual(self.add(self.client, 2).status_code, 200)
+        response = self.add(self.other_client, 2)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.other).exists())
+
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.add(self.other_client, 2).status_code, 200)
+
+    def test_checkout_rechecks_lapsed_holds(self):
+        StoreSetting.objects.create(auto_stock_deduction=True)
+        CartItem.objects.filter(cart__user=self.user).delete()
+        self.add(self.client, 2)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.add(self.other_client, 3)  # the lapsed hold let this cart take everything
+
+        response = self.client.post('/api/place-order/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['items'][0]['available'], 0)
+        self.assertEqual(self.other_client.post('/api/place-order/').status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 0)
+        self.assertFalse(StockReservation.objects.filter(cart_item__cart__user=self.other).exists())
+
+    def test_buy_now_respects_other_carts_holds(self):
+        StoreSetting.objects.create(auto_stock_deduction=True)
+        self.add(self.other_client, 2)
+
+        response = self.client.post('/api/buy-now/', {'product_id': self.product.id, 'quantity': 2})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/buy-now/', {'product_id': self.product.id, 'quantity': 1}).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+
+
+class AsyncViewTests(CatalogFixtureMixin, TestCase):
+    async def test_matches_sync_endpoints(self):
+        client = AsyncClient()
+        paths = ['products/?page=2&page_size=4', 'products/?pagination=cursor&page_size=4',
+                 f'products/{self.products[0].id}/', 'search-products/?q=phone']
+        for path in paths:
+            sync_data = await sync_to_async(lambda: self.client.get(f'/api/{path}').json())()
+            async_response = await client.get(f'/api/async/{path}')
+            self.assertEqual(async_response.status_code, 200, path)
+            expected = json.loads(json.dumps(sync_data).replace('/api/', '/api/async/'))
+            self.assertEqual(async_response.json(), expected, path)
+
+    async def test_listing_shares_the_response_cache(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get('/api/async/products/?page_size=4'))['X-Cache'], 'MISS')
+        self.assertEqual((await client.get('/api/async/products/?page_size=4'))['X-Cache'], 'HIT')
+        self.assertEqual((await client.get('/api/async/products/?page=99')).status_code, 404)
+
+        def rename():
+            with self.captureOnCommitCallbacks(execute=True):
+                Product.objects.get(pk=self.products[0].pk).save()
+        await sync_to_async(rename)()
+        self.assertEqual((await client.get('/api/async/products/?page_size=4'))['X-Cache'], 'MISS')
+
+    async def test_cart_count_with_jwt(self):
+        token = str(AccessToken.for_user(self.user))
+        response = await AsyncClient().get('/api/async/cart/count/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.json(), {'count': 5})
+        self.assertEqual((await AsyncClient().get('/api/async/cart/count/')).status_code, 401)
+
+        await CustomUser.objects.filter(pk=self.user.pk).aupdate(is_active=False)
+        await sync_to_async(forget_user_active)(self.user.pk)
+        response = await AsyncClient().get('/api/async/cart/count/', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(PERF_SERVER_TIMING=True)
+class PerformanceMiddlewareTests(CatalogFixtureMixin, TestCase):
+    perf_log = True
+
+    def test_server_timing_and_log_line(self):
+        token = str(AccessToken.for_user(self.user))
+        client = APIClient()
+        with self.assertLogs('api.perf', level='INFO') as logs:
+            response = client.get('/api/my-cart/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        timing = response['Server-Timing']
+        self.assertIn('db;desc="3 queries"', timing)
+        for name in ('auth;dur=', 'serialize;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(name, timing)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['path'], line['status'], line['db_queries']), ('/api/my-cart/', 200, 3))
+        self.assertIn('serialize_ms', line)
+
+    def test_serializer_time_counted_once(self):
+        token = perf.begin()
+        try:
+            metrics = perf.current()
+            with mock.patch.object(metrics, 'add', wraps=metrics.add) as add:
+                data = ProductDetailSerializer(self.products[0]).data
+                self.assertEqual(ProductListSerializer(self.products, many=True).data[0]['id'], self.products[0].id)
+        finally:
+            perf.end(token)
+        self.assertEqual(data['id'], self.products[0].id)
+        self.assertEqual([call.args[0] for call in add.call_args_list], ['serialize', 'serialize'])
+        ProductListSerializer(self.products, many=True).data  # no request open: not timed, no error
+
+    def test_only_api_serializers_are_timed(self):
+        # The timer is a mixin on the API's serializers; other serializers (DRF's, admin, third-party) are untouched
+        class PlainSerializer(serializers.Serializer):
+            name = serializers.CharField()
+
+        token = perf.begin()
+        try:
+            PlainSerializer({'name': 'plain'}).data
+            PlainSerializer([{'name': 'plain'}], many=True).data
+            self.assertNotIn('serialize', perf.current().timings)
+            ProductListSerializer(self.products, many=True).data
+            self.assertIn('serialize', perf.current().timings)
+        finally:
+            perf.end(token)
+
+
+@override_settings(CACHE_ALLOW_LOCAL=True)
+class BenchmarkSuiteTests(TestCase):
+    def test_seed_and_benchmark(self):
+        call_command('seed_data', users=3, products=50, categories=2, subcategories=2, brands=3, stdout=io.StringIO())
+        self.assertEqual(Product.objects.count(), 50)
+        self.assertEqual(Order.objects.count(), 15)
+
+        suite = BenchmarkSuite(iterations=3, warmup=0, host='testserver')
+        with override_settings(PERF_LOG_REQUESTS=False):
+            report = suite.run(only={'products.list', 'cart.count', 'orders.place'})
+        self.assertEqual([row['endpoint'] for row in report['results']], ['products.list', 'cart.count', 'orders.place'])
+        for row in report['results']:
+            self.assertEqual(sum(row['status_codes'].values()), 3)
+            self.assertTrue(set(row['status_codes']) <= {'200', '201'}, row)
+            self.assertEqual(set(row['latency_ms']), {'p50', 'p95', 'p99', 'mean'})
+
+    def test_percentile(self):
+        self.assertEqual(percentile(range(1, 101), 95), 95)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+
+
+class ProductImportExportTests(CatalogFixtureMixin, TestCase):
+    def import_csv(self, text, **options):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/products.csv'
+        with open(path, 'w') as stream:
+            stream.write(text)
+        out, err = io.StringIO(), io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_products', path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_upsert_by_sku(self):
+        Product.objects.filter(pk=self.products[0].pk).update(sku='PHONE-0')
+        out, err = self.import_csv(
+            'sku,name,price,stock,category,subcategory,brand\n'
+            'PHONE-0,Phone 0,150,7,Electronics,Phone,Brand 0\n'
+            'TAB-1,Tablet One,300,2,Electronics,Tablet,Brand 1\n'
+            'TAB-2,Tablet Two,oops,2,Electronics,Phone,Brand 1\n',
+            chunk_size=2, create_taxonomy=True,
+        )
+        self.assertIn('Created 1, updated 1, unchanged 0, rejected 1', out)
+        self.assertIn("row 4: invalid price 'oops'", err)
+
+        self.products[0].refresh_from_db()
+        self.assertEqual((self.products[0].price, self.products[0].stock), (150, 7))
+        tablet = Product.objects.select_related('subcategory').get(sku='TAB-1')
+        self.assertEqual((tablet.subcategory.name, tablet.brand_id), ('Tablet', self.brands[1].id))
+        self.assertEqual(search_product_ids('tablet'), [tablet.id])
+        self.assertEqual(self.client.get('/api/products/?page_size=20').json()['count'], 16)
+
+    def test_unknown_taxonomy_is_rejected(self):
+        out, err = self.import_csv('sku,name,price,brand\nX-1,Thing,1,Nobody\n')
+        self.assertIn("unknown brand 'Nobody'", err)
+        self.assertFalse(Brand.objects.filter(name='Nobody').exists())
+
+    def test_export_round_trip(self):
+        Product.objects.update(sku=Concat(Value('SKU-'), 'id', output_field=CharField()))
+        out = io.StringIO()
+        call_command('export_products', format='jsonl', stdout=out, stderr=io.StringIO())
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 15)
+        self.assertEqual(rows[0], {
+            'id': self.products[0].id, 'sku': f'SKU-{self.products[0].id}', 'name': 'Phone 0', 'description': 'A phone', 'price': '100.00',
+            'stock': 50, 'category': 'Electronics', 'subcategory': 'Phone', 'brand': 'Brand 0', 'is_active': True,
+        })
+
+        csv_out = io.StringIO()
+        call_command('export_products', stdout=csv_out, stderr=io.StringIO())
+        out, err = self.import_csv(csv_out.getvalue())
+        self.assertIn('Created 0, updated 0, unchanged 15, rejected 0', out)
+
+    def test_products_without_sku_round_trip_by_id(self):
+        Product.objects.filter(pk=self.products[0].pk).update(sku='PHONE-0')
+        csv_out = io.StringIO()
+        call_command('export_products', stdout=csv_out, stderr=io.StringIO())
+        exported = csv_out.getvalue().replace('Phone 1,', 'Phone One,')
+        out, err = self.import_csv(exported)
+        self.assertIn('Created 0, updated 1, unchanged 14, rejected 0', out)
+        self.products[1].refresh_from_db()
+        self.assertEqual((self.products[1].name, self.products[1].sku), ('Phone One', None))
+
+        out, err = self.import_csv('id,name,price\n999999,Ghost,1\n,Nameless,1\n')
+        self.assertIn("row 2: unknown product id 999999", err)
+        self.assertIn("row 3: sku or id is required", err)
+
+    def test_blank_name_is_rejected(self):
+        out, err = self.import_csv(f'id,name,price\n{self.products[0].id},,120\n')
+        self.assertIn("row 2: name cannot be blank", err)
+        self.products[0].refresh_from_db()
+        self.assertEqual((self.products[0].name, self.products[0].price), ('Phone 0', 100))
+
+    def test_field_limits_are_row_errors(self):
+        out, err = self.import_csv(
+            'sku,name,price,stock\n'
+            f'LONG-1,{"x" * 256},1,1\n'
+            'BIG-1,Big,123456789012,1\n'
+            'NEG-1,Negative,1,-3\n'
+            f'{"s" * 65},Long SKU,1,1\n'
+            'OK-1,Fine,1,1\n'
+        )
+        self.assertIn('Created 1, updated 0, unchanged 0, rejected 4', out)
+        self.assertIn('row 2: invalid name: Ensure this value has at most 255 characters', err)
+        self.assertIn('row 3: invalid price: Ensure that there are no more than 10 digits in total.', err)
+        self.assertIn("row 4: invalid stock '-3'", err)
+        self.assertIn('row 5: invalid sku: Ensure this value has at most 64 characters', err)
+
+    def test_stdin_is_left_open(self):
+        stdin = io.StringIO('sku,name,price\nSTDIN-1,From stdin,5\n')
+        with mock.patch('sys.stdin', stdin), self.captureOnCommitCallbacks(execute=True):
+            call_command('import_products', '-', stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertFalse(stdin.closed)
+        self.assertTrue(Product.objects.filter(sku='STDIN-1').exists())
+
+    def test_subcategory_update_uses_existing_category(self):
+        tablet = SubCategory.objects.create(category=self.products[0].category, name='Tablet')
+        out, err = self.import_csv(f'id,subcategory\n{self.products[0].id},tablet\n')
+        self.assertIn('Created 0, updated 1, unchanged 0, rejected 0', out)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].subcategory_id, tablet.id)
+
+
+class ProductBulkUpdateTests(CatalogFixtureMixin, TestCase):
+    url = '/api/admin/products/bulk-update/'
+
+    def setUp(self):
+        super().setUp()
+        self.admin = CustomUser.objects.create_user(email='admin@example.com', password='secret123', name='Admin',
+                                                    is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_applies_rows_and_reports_each(self):
+        self.assertEqual(self.client.get('/api/products/?page_size=20').status_code, 200)  # warm the cache
+        payload = [{'id': product.id, 'price': '9.99', 'stock': 3} for product in self.products[:10]] + [
+            {'id': self.products[10].id, 'stock': 50},
+            {'id': self.products[11].id, 'price': '-1'},
+            {'id': 999999, 'is_active': False},
+            {'id': self.products[12].id},
+        ]
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(4):
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['summary'], {'updated': 10, 'unchanged': 1, 'invalid': 2, 'not_found': 1})
+        self.assertEqual([row['status'] for row in data['results'][10:]],
+                         ['unchanged', 'invalid', 'not_found', 'invalid'])
+        self.assertIn('price', data['results'][11]['errors'])
+
+        self.assertEqual(Product.objects.filter(price='9.99', stock=3).count(), 10)
+        listing = self.client.get('/api/products/?page_size=20')
+        self.assertEqual(listing['X-Cache'], 'MISS')
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, [{'id': self.products[0].id, 'stock': 1}], format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class OrderExportTests(CatalogFixtureMixin, TestCase):
+    url = '/api/admin/orders/export/'
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(CustomUser.objects.create_user(
+            email='finance@example.com', password='secret123', name='Finance', is_staff=True,
+        ))
+        self.shipped = OrderStatus.objects.create(name='Shipped')
+        self.old_order = Order.objects.create(user=self.user, total_price=0, status=self.shipped)
+        Order.objects.filter(pk=self.old_order.pk).update(created_at=timezone.now() - timedelta(days=30))
+
+    def export(self, query=''):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_lines(self):
+        lines = self.export().splitlines()
+        self.assertEqual(lines[0], 'order_id,created_at,email,status,order_total,product_id,sku,product_name,'
+                                   'quantity,unit_price')
+        self.assertEqual(len(lines), 1 + 5 * 3 + 1)  # the item-less order still gets a row
+        self.assertIn(f'{self.old_order.id},', lines[1])
+
+    def test_filters(self):
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        rows = [json.loads(line) for line in self.export(f'?file_format=jsonl&from={since}').splitlines()]
+        self.assertEqual(len(rows), 15)
+        self.assertEqual((rows[0]['email'], rows[0]['status'], rows[0]['product_name']),
+                         ('buyer@example.com', 'Order Received', 'Phone 0'))
+        rows = self.export('?file_format=jsonl&status=shipped').splitlines()
+        self.assertEqual([json.loads(line)['order_id'] for line in rows], [self.old_order.id])
+        self.assertEqual(self.client.get(self.url + '?from=yesterday').status_code, 400)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_orders', format='jsonl', status='Order Received', stdout=out, stderr=io.StringIO())
+        self.assertEqual(len(out.getvalue().splitlines()), 15)
+
+
+class OrderHistoryTests(CatalogFixtureMixin, TestCase):
+    def test_full_history_uses_one_prefetch_plan(self):
+        with self.assertNumQueries(3):
+            data = self.client.get('/api/my-orders/?page_size=100').json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(data['results'][0]['status'], 'Order Received')
+        self.assertEqual([item['product_name'] for item in data['results'][0]['items']], ['Phone 0', 'Phone 1', 'Phone 2'])
+
+    def test_summary_mode_set_at_checkout(self):
+        CartItem.objects.filter(product=self.products[0]).update(quantity=2)
+        self.assertEqual(self.client.post('/api/place-order/').status_code, 201)
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/my-orders/?summary=true').json()
+        self.assertEqual(data['results'][0], {
+            'id': data['results'][0]['id'], 'created_at': data['results'][0]['created_at'],
+            'total_price': '610.00', 'status': 'Order Received', 'item_count': 6,
+            'summary': 'Phone 0, Phone 1, Phone 2 +2 more',
+        })
+
+    def test_status_name_follows_status(self):
+        order = Order.objects.filter(user=self.user).first()
+        shipped = OrderStatus.objects.create(name='Shipped')
+        order.status = shipped
+        order.save()
+        shipped.name = 'Dispatched'
+        shipped.save()
+        order.refresh_from_db()
+        self.assertEqual(order.status_name, 'Dispatched')
+        shipped.delete()
+        order.refresh_from_db()
+        self.assertEqual((order.status_id, order.status_name), (None, ''))
+
+    def test_backfill(self):
+        Order.objects.update(item_count=0, summary='', status_name='')
+        call_command('backfill_order_summaries', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(
+            set(Order.objects.values_list('item_count', 'summary', 'status_name')),
+            {(3, 'Phone 0, Phone 1, Phone 2', 'Order Received')},
+        )
+
+
+class FeedbackFeedTests(CatalogFixtureMixin, TestCase):
+    def test_cursor_pages(self):
+        url = f'/api/feedback/product/{self.products[0].id}/?pagination=cursor&page_size=4'
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 4)
+        self.assertEqual(first['results'][0]['product'], 'Phone 0')
+        self.assertEqual(first['results'][0]['user'], 'buyer@example.com')
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        ids = [row['id'] for row in first['results'] + second['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+        with self.assertNumQueries(1):
+            data = self.client.get('/api/feedback/my/?pagination=cursor&page_size=100').json()
+        self.assertEqual(len(data['results']), 10)
+
+    def test_plain_list_without_opt_in(self):
+        data = self.client.get(f'/api/feedback/product/{self.products[0].id}/').json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 6)
+        self.assertEqual([row['id'] for row in data], sorted((row['id'] for row in data), reverse=True))
+        self.assertEqual(len(self.client.get('/api/feedback/my/').json()), 10)
+
+    def test_product_and_user_renames_refresh_cached_feed(self):
+        url = f'/api/feedback/product/{self.products[0].id}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].name = 'Phone Zero'
+            self.products[0].save()
+        feed = self.client.get(url)
+        self.assertEqual((feed['X-Cache'], feed.json()[0]['product']), ('MISS', 'Phone Zero'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.email = 'renamed@example.com'
+            self.user.save()
+        feed = self.client.get(url)
+        self.assertEqual((feed['X-Cache'], feed.json()[0]['user']), ('MISS', 'renamed@example.com'))
+
+    def test_stats_maintained_and_shown_on_detail(self):
+        product = self.products[1]
+        detail = self.client.get(f'/api/products/{product.id}/').json()
+        self.assertEqual((detail['feedback']['count'], detail['feedback']['unresolved']), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get(f'/api/feedback/product/{product.id}/')['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(f'/api/feedback/product/{product.id}/')['X-Cache'], 'HIT')
+            Feedback.objects.create(user=self.user, product=product, message='Great', is_resolved=True)
+        feed = self.client.get(f'/api/feedback/product/{product.id}/')
+        self.assertEqual((feed['X-Cache'], len(feed.json())), ('MISS', 2))
+
+        feedback = Feedback.objects.filter(product=product, is_resolved=False).get()
+        feedback.product = self.products[2]
+        feedback.save()
+        with self.assertNumQueries(1):
+            detail = self.client.get(f'/api/products/{product.id}/').json()
+        self.assertEqual((detail['feedback']['count'], detail['feedback']['unresolved']), (1, 0))
+        self.assertEqual(ProductFeedbackStats.objects.get(product=self.products[2]).feedback_count, 2)
+
+        self.products[2].delete()
+        self.assertFalse(ProductFeedbackStats.objects.filter(product_id=self.products[2].id).exists())
+
+
+class StatelessAuthenticationTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def test_no_user_query_once_active_flag_is_cached(self):
+        with self.assertNumQueries(2):  # is_active lookup + count
+            self.assertEqual(self.client.get('/api/cart/count/').json(), {'count': 5})
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/cart/count/').json(), {'count': 5})
+        with self.assertNumQueries(3):  # count + orders + lines
+            self.assertEqual(self.client.get('/api/my-orders/').json()['count'], 5)
+
+    def test_deactivation_is_seen_immediately(self):
+        self.assertEqual(self.client.get('/api/cart/count/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/cart/count/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+    def test_claims_user(self):
+        token = AccessToken.for_user(self.user)
+        token['email'] = self.user.email
+        user = StatelessJWTAuthentication().get_user(token)
+        self.assertEqual((user.id, user.email, str(user)), (self.user.id, 'buyer@example.com', 'buyer@example.com'))
+
+
+class TokenBlacklistFilterTests(CatalogFixtureMixin, TestCase):
+    def test_bloom_filter(self):
+        bloom = BloomFilter.for_capacity(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'jti-{i}')
+        copy = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertTrue(all(f'jti-{i}' in copy for i in range(1000)))
+        false_positives = sum(f'other-{i}' in copy for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def worker(self, worker_cache):
+        """A simulated worker process: its view of the cache and its own copy of the filter."""
+        filter_copy = VersionedLocalCache(NAMESPACE, _load_filter)
+
+        @contextmanager
+        def run():
+            with mock.patch('api.cache.cache', worker_cache), mock.patch('api.token_filter.cache', worker_cache), \
+                    mock.patch('api.token_filter.blacklist_filter', filter_copy):
+                yield
+        return run
+
+    def refresh(self, token):
+        return self.client.post('/api/refresh/', {'refresh': str(token)}, format='json')
+
+    def logout(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/logout/', {'refresh': str(token)}, format='json').status_code, 205)
+
+    @mock.patch('api.token_filter.is_shared_cache', return_value=True)
+    def test_refresh_skips_blacklist_query_and_rejects_after_logout(self, shared):
+        refresh = RefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(refresh).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:  # filter already built by the first refresh
+            response = self.refresh(refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'blacklistedtoken' in q['sql']])
+
+        self.logout(refresh)
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+
+    @mock.patch('api.token_filter.is_shared_cache', return_value=True)
+    def test_logout_reaches_other_workers_through_shared_cache(self, shared):
+        shared_cache = LocMemCache('token-filter-shared', {})
+        worker_a, worker_b = self.worker(shared_cache), self.worker(shared_cache)
+        refresh = RefreshToken.for_user(self.user)
+        with worker_b():
+            self.assertEqual(self.refresh(refresh).status_code, 200)
+        with worker_a():
+            self.logout(refresh)
+        with worker_b():
+            self.assertEqual(self.refresh(refresh).status_code, 401)
+
+    def test_process_local_cache_always_checks_database(self):
+        # Two workers on LocMemCache: worker B never sees worker A's version bump
+        worker_a = self.worker(LocMemCache('token-filter-a', {}))
+        worker_b = self.worker(LocMemCache('token-filter-b', {}))
+        refresh = RefreshToken.for_user(self.user)
+        with worker_b():
+            self.assertEqual(self.refresh(refresh).status_code, 200)
+            self.assertTrue(might_be_blacklisted(refresh['jti']))
+        with worker_a():
+            self.logout(refresh)
+        with worker_b():
+            self.assertEqual(self.refresh(refresh).status_code, 401)
+
+    def test_prune_tokens(self):
+        expired = RefreshToken.for_user(self.user)
+        expired.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - timedelta(days=1))
+        RefreshToken.for_user(self.user)
+        call_command('prune_tokens', batch_size=1, stdout=io.StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class StoreConfigCacheTests(CatalogFixtureMixin, TestCase):
+    def test_checkout_reads_config_from_memory(self):
+        setting = StoreSetting.objects.create(auto_stock_deduction=False)
+        store_config.auto_stock_deduction()  # warm
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/buy-now/', {'product_id': self.products[0].id, 'quantity': 2},
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('api_orderstatus', tables)
+        self.assertNotIn('api_storesetting', tables)
+        order = Order.objects.get(pk=response.json()['order_id'])
+        self.assertEqual(order.status_name, 'Order Received')
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 50)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            setting.auto_stock_deduction = True
+            setting.save()
+        self.client.post('/api/buy-now/', {'product_id': self.products[0].id, 'quantity': 2}, format='json')
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 48)
+
+    def test_unknown_status(self):
+        with self.assertRaises(OrderStatus.DoesNotExist):
+            store_config.order_status('Nope')
+
+    def test_renamed_status_is_served_after_commit(self):
+        status = OrderStatus.objects.get(name='Order Received')
+        store_config.order_status()  # warm
+        with self.captureOnCommitCallbacks(execute=True):
+            status.name = 'Received'
+            status.save()
+        with self.assertNumQueries(2):  # the bump reloads the copy on the next read
+            self.assertEqual(store_config.order_status('Received').pk, status.pk)
+        with self.assertNumQueries(0):
+            store_config.order_status('Received')
+        with self.assertRaises(OrderStatus.DoesNotExist):
+            store_config.order_status('Order Received')
+
+    def test_no_local_copy_without_coherent_cache(self):
+        store_config.order_status()  # warm
+        # Another worker's bump would land in its own LocMemCache, never in ours
+        with override_settings(CACHE_ALLOW_LOCAL=False):
+            OrderStatus.objects.filter(name='Order Received').update(name='Received')
+            with self.assertNumQueries(2):  # StoreSetting, OrderStatus
+                self.assertEqual(store_config.order_status('Received').name, 'Received')
+
+    def test_status_missing_from_stale_copy_is_queried(self):
+        store_config.order_status()  # warm
+        # Renamed by a worker whose bump we never saw (queryset update skips the signals)
+        OrderStatus.objects.filter(name='Order Received').update(name='Received')
+        with self.assertNumQueries(1):
+            status = store_config.order_status('Received')
+        self.assertEqual(status.name, 'Received')
+        with self.assertRaises(OrderStatus.DoesNotExist):
+            store_config.order_status('Nope')
+
+    def test_stale_copy_expires(self):
+        setting = StoreSetting.objects.create(auto_stock_deduction=False)
+        config = VersionedLocalCache('store_config', store_config.load_config, max_age=60)
+        self.enterContext(mock.patch.object(store_config, 'config_cache', config))
+        self.assertFalse(store_config.auto_stock_deduction())
+        StoreSetting.objects.filter(pk=setting.pk).update(auto_stock_deduction=True)  # bump missed
+        self.assertFalse(store_config.auto_stock_deduction())
+        later = time.monotonic() + 61
+        with mock.patch('api.cache.time.monotonic', return_value=later):
+            self.assertTrue(store_config.auto_stock_deduction())
+
+
+class QueryPlanTests(CatalogFixtureMixin, TestCase):
+    """
+    EXPLAIN the queries that the hot API requests run and fail on full table
+    scans (and, on SQLite, on sorts) of the tables each request is about.
+    """
+
+    def hot_requests(self):
+        """(name, method, path, data, tables whose queries are checked)."""
+        category, brand, product = self.category.id, self.brands[0].id, self.products[0].id
+        next_page = self.client.get('/api/products/category/%d/?pagination=cursor&page_size=4' % category).data['next']
+        return [
+            ('product listing', 'get', '/api/products/?page=2&page_size=4', None, {'api_product'}),
+            ('product listing, cursor', 'get', '/api/products/?pagination=cursor&page_size=4', None, {'api_product'}),
+            ('category listing', 'get', f'/api/products/category/{category}/?page=2&page_size=4', None, {'api_product'}),
+            ('category listing, next cursor page', 'get', next_page, None, {'api_product'}),
+            ('brand listing', 'get', f'/api/products/brand/{brand}/?page_size=2', None, {'api_product'}),
+            ('subcategory listing', 'get', f'/api/products/subcategory/{self.subcategory.id}/?page_size=4', None,
+             {'api_product'}),
+            ('order history', 'get', '/api/my-orders/', None, {'api_order', 'api_orderitem'}),
+            ('order export', 'get', '/api/admin/orders/export/?from=2020-01-01', None, {'api_order'}),
+            ('order export by status', 'get', '/api/admin/orders/export/?from=2020-01-01&status=Order+Received',
+             None, {'api_order'}),
+            ('product feedback feed', 'get', f'/api/feedback/product/{product}/', None, {'api_feedback'}),
+            ('user feedback feed', 'get', '/api/feedback/my/', None, {'api_feedback'}),
+            ('cart', 'get', '/api/my-cart/', None, {'api_cartitem'}),
+            ('add to cart', 'post', '/api/cart/add/', {'product_id': self.products[1].id, 'quantity': 1},
+             {'api_cartitem', 'api_stockreservation'}),
+        ]
+
+    def request_queries(self, requests):
+        """Run each request and yield ``(name, sql)`` for its queries on the tables it lists."""
+        self.user.is_staff = True  # the export is staff-only; nothing else depends on it
+        self.user.save(update_fields=['is_staff'])
+        for name, method, path, data, tables in requests:
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(path, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 300, name)
+            checked = [query['sql'] for query in queries
+                       if query['sql'].startswith('SELECT')
+                       and re.search(r'\bFROM "(\w+)"', query['sql']).group(1) in tables]
+            self.assertTrue(checked, f'{name}: no queries on {tables}')
+            for sql in checked:
+                yield name, sql
+
+    def explain(self, sql, prefix):
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_sqlite_plans_use_indexes(self):
+        table_scan = re.compile(r'\bSCAN (\w+)$')  # "SCAN t USING INDEX i" walks an index and is fine
+        for name, sql in self.request_queries(self.hot_requests()):
+            plan = self.explain(sql, 'EXPLAIN QUERY PLAN')
+            with self.subTest(name, sql=sql, plan=plan):
+                self.assertFalse([line for line in plan if table_scan.search(line)])
+                self.assertFalse([line for line in plan if 'USE TEMP B-TREE' in line])
+
+    @skipUnless(connection.vendor == 'postgresql', 'PostgreSQL query plans')
+    def test_postgres_plans_use_indexes(self):
+        requests = self.hot_requests() + [
+            ('search', 'get', '/api/search-products/?q=pho', None, {'api_productsearchterm'}),
+        ]
+        with transaction.atomic():
+            queries = list(self.request_queries(requests))
+            with connection.cursor() as cursor:
+                # Tiny test tables make a seq scan the cheapest plan; disabling it shows whether an index fits
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, sql in queries:
+                plan = '\n'.join(self.explain(sql, 'EXPLAIN'))
+                with self.subTest(name, sql=sql, plan=plan):
+                    self.assertNotIn('Seq Scan', plan)
+
+    def test_migrations_match_models(self):
+        # The indexes only reach existing databases through migrations, so none may be left ungenerated
+        call_command('makemigrations', 'api', check=True, dry_run=True, stdout=io.StringIO())
+
+
+class BackfillMigrationTests(TransactionTestCase):
+    """Data written before the denormalized columns existed is filled in by 0013_backfill_denormalized_data."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([('api', target)])
+        return executor.loader.project_state([('api', target)]).apps
+
+    def test_backfill(self):
+        self.addCleanup(call_command, 'migrate', verbosity=0)  # leave the schema at the latest migration
+        apps = self.migrate('0012_outbox_events')
+        user = apps.get_model('api', 'CustomUser').objects.create(email='old@example.com', name='Old')
+        brand = apps.get_model('api', 'Brand').objects.create(name='Acme')
+        product = apps.get_model('api', 'Product').objects.create(name='Old Phone', price=10, brand=brand)
+        status = apps.get_model('api', 'OrderStatus').objects.create(name='Shipped')
+        order = apps.get_model('api', 'Order').objects.create(user=user, total_price=20, status=status)
+        apps.get_model('api', 'OrderItem').objects.create(order=order, product=product, quantity=2, price=10)
+        apps.get_model('api', 'Feedback').objects.create(user=user, product=product, message='Fine')
+
+        self.migrate('0013_backfill_denormalized_data')
+        order = Order.objects.get(pk=order.pk)
+        self.assertEqual((order.status_name, order.item_count, order.summary), ('Shipped', 2, 'Old Phone'))
+        self.assertEqual(DatabaseSearchBackend().search('acme phone'), [product.pk])
+        stats = ProductFeedbackStats.objects.get(product_id=product.pk)
+        self.assertEqual((stats.feedback_count, stats.unresolved_count), (1, 1))
+
+
+@override_settings(REPLICA_DATABASES=['replica0'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTests(CatalogFixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.shared_cache = self.enterContext(mock.patch('api.middleware.is_shared_cache', return_value=True))
+
+    def routed(self, request, *models, write=None):
+        token = db_router.begin(request)
+        try:
+            reads = [self.router.db_for_read(model) for model in models]
+            if write is not None:
+                self.router.db_for_write(write)
+                reads += [self.router.db_for_read(model) for model in models]
+            return reads
+        finally:
+            db_router.end(token)
+
+    def test_catalog_reads_go_to_replica(self):
+        self.assertEqual(self.routed(self.factory.get('/'), Product, Feedback, Order, Cart),
+                         ['replica0', 'replica0', 'default', 'default'])
+        self.assertEqual(self.routed(self.factory.post('/'), Product), ['default'])
+        self.assertEqual(self.router.db_for_read(Product), 'default')  # outside a request
+
+    def test_write_pins_request_and_user(self):
+        self.assertEqual(self.routed(self.factory.get('/', **self.auth), Product, write=Order),
+                         ['replica0', 'default'])
+        self.assertEqual(self.routed(self.factory.get('/', **self.auth), Product), ['default'])
+        self.assertEqual(self.routed(self.factory.get('/'), Product), ['replica0'])  # other callers unaffected
+
+    def test_catalog_edit_pins_catalog_reads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[0].name = 'Renamed'
+            self.products[0].save()
+        self.assertEqual(self.routed(self.factory.get('/'), Product), ['default'])
+        cache.delete(db_router.CATALOG_PIN_KEY)
+        self.assertEqual(self.routed(self.factory.get('/'), Product), ['replica0'])
+
+    def test_cart_and_checkout_writes_dont_pin_catalog(self):
+        StoreSetting.objects.create(auto_stock_deduction=True)
+        self.routed(self.factory.post('/'), write=Product)  # select_for_update, stock deduction
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/cart/add/', {'product_id': self.products[6].id, 'quantity': 1},
+                                              format='json').status_code, 200)
+            self.assertEqual(self.client.post('/api/place-order/').status_code, 201)
+        self.assertIsNone(cache.get(db_router.CATALOG_PIN_KEY))
+        self.assertEqual(self.routed(self.factory.get('/'), Product), ['replica0'])
+
+    def test_feedback_writes_and_email_changes_dont_pin_catalog(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            feedback = Feedback.objects.create(user=self.user, product=self.products[0], message='Great')
+            feedback.delete()
+            self.user.email = 'renamed@example.com'
+            self.user.save()
+        self.assertIsNone(cache.get(db_router.CATALOG_PIN_KEY))
+        self.assertEqual(self.routed(self.factory.get('/'), Product, Feedback), ['replica0', 'replica0'])
+
+    def test_middleware_not_installed_without_replicas(self):
+        with override_settings(REPLICA_DATABASES=[]), self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(lambda request: None)
+
+    def test_middleware_needs_shared_cache(self):
+        # Pins written to one worker's LocMemCache would never reach the others
+        self.shared_cache.return_value = False
+        with self.assertRaises(ImproperlyConfigured):
+            ReplicaRoutingMiddleware(lambda request: None)
+
+
+class OutboxTests(CatalogFixtureMixin, TestCase):
+    def register(self, topic, function):
+        outbox._handlers[topic] = function
+        self.addCleanup(outbox._handlers.pop, topic)
+
+    def test_checkout_records_event_for_worker(self):
+        StoreSetting.objects.create(auto_stock_deduction=True)
+        version = get_version('stock')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/buy-now/', {'product_id': self.products[0].id, 'quantity': 2},
+                                        format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(get_version('stock'), version + 1)  # cache invalidation stays inline
+        placed = OutboxEvent.objects.get()
+        self.assertEqual((placed.topic, placed.payload['order_id']), ('order.placed', response.json()['order_id']))
+
+        with self.assertLogs('api.events', 'INFO'):
+            self.assertEqual(outbox.process_batch(), (1, 0, 0))
+        placed.refresh_from_db()
+        self.assertEqual(placed.status, OutboxEvent.DONE)
+        self.assertEqual(outbox.process_batch(), (0, 0, 0))
+
+    def test_handlers_run_after_the_claim_commits(self):
+        seen = []
+
+        def slow(payload):
+            # Another worker polling now finds the batch leased instead of waiting on row locks
+            seen.append((payload['n'], outbox.claim()))
+
+        self.register('test.slow', slow)
+        for n in range(2):
+            outbox.publish('test.slow', {'n': n})
+        self.assertEqual(outbox.process_batch(), (2, 0, 0))
+        self.assertEqual(seen, [(0, []), (1, [])])
+
+    def test_lease_expiry_redelivers(self):
+        event = outbox.publish('order.placed', {'order_id': 1})
+        self.assertEqual(outbox.claim(), [event])  # the worker dies before running it
+        self.assertEqual(outbox.claim(), [])
+        OutboxEvent.objects.update(available_at=timezone.now())
+        self.assertEqual(outbox.claim(), [event])
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_handler_backs_off_then_fails(self):
+        def explode(payload):
+            OutboxEvent.objects.create(topic='side.effect')  # rolled back with the handler
+            raise RuntimeError('boom')
+
+        self.register('test.explode', explode)
+        event = outbox.publish('test.explode', {'n': 1})
+        self.enterContext(self.assertLogs('api.outbox', 'WARNING'))
+
+        self.assertEqual(outbox.process_batch(), (0, 1, 0))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts, event.last_error), ('pending', 1, 'RuntimeError: boom'))
+        self.assertGreater(event.available_at, timezone.now())
+        self.assertFalse(OutboxEvent.objects.filter(topic='side.effect').exists())
+        self.assertEqual(outbox.process_batch(), (0, 0, 0))  # not due yet
+
+        OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+        self.assertEqual(outbox.process_batch(), (0, 0, 1))
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), ('failed', 2))
+        self.assertIsNotNone(event.processed_at)
+
+    def test_backoff_grows_and_is_capped(self):
+        with override_settings(OUTBOX_BACKOFF_SECONDS=5, OUTBOX_BACKOFF_MAX=60):
+            self.assertLessEqual(outbox.backoff(1), timedelta(seconds=6))
+            self.assertGreaterEqual(outbox.backoff(3), timedelta(seconds=16))
+            self.assertLessEqual(outbox.backoff(20), timedelta(seconds=72))
+
+    def test_command_drains_and_prunes(self):
+        month_ago = timezone.now() - timedelta(days=31)
+        for status in (OutboxEvent.DONE, OutboxEvent.FAILED):
+            OutboxEvent.objects.create(topic='order.placed', status=status, processed_at=month_ago)
+        outbox.publish('order.placed', {'order_id': 2})
+        out = io.StringIO()
+        with self.assertLogs('api.events', 'INFO'):
+            call_command('process_outbox', batch_size=1, stdout=out)
+        self.assertIn('Processed 1 events', out.getvalue())
+        self.assertIn('Pruned 1 done events', out.getvalue())
+        self.assertIn('Pruned 1 failed events', out.getvalue())
+        self.assertEqual(list(OutboxEvent.objects.values_list('status', flat=True)), ['done'])
@@ -0,0 +1,106 @@
+"""
+Bloom filter over blacklisted refresh-token ids (jti).
+
+simplejwt checks every refresh token against BlacklistedToken with a query.
+The filter answers "definitely not blacklisted" from memory instead, so only
+the rare possible match (a blacklisted token, or a false positive at about
+TOKEN_BLACKLIST_FILTER_FP_RATE) still reaches the table.
+
+The filter covers unexpired blacklisted tokens and is versioned under the
+``token_blacklist`` namespace (see ``api.cache``): blacklisting a token or
+pruning expired ones bumps the version. The first process to see a new version
+builds the filter and shares its bytes through the cache. The others load
+those bytes, and every process keeps a local copy.
+
+A process only hears about a new blacklist entry through that shared version,
+so the filter is only used with a shared cache backend. On a process-local
+cache every check goes to the database, as simplejwt does.
+"""
+import hashlib
+import math
+import struct
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import VersionedLocalCache, get_version, is_shared_cache
+
+NAMESPACE = 'token_blacklist'
+FILTER_KEY = 'token-blacklist-filter:{}'
+MIN_BITS = 1024
+HEADER = struct.Struct('>IB')  # bit count, hash count
+
+
+class BloomFilter:
+    def __init__(self, size, hashes, bits=None):
+        self.size = size
+        self.hashes = hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((size + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate):
+        capacity = max(capacity, 1)
+        size = max(MIN_BITS, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        hashes = max(1, round(size / capacity * math.log(2)))
+        return cls(size, min(hashes, 16))
+
+    def _positions(self, value):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+    def to_bytes(self):
+        return HEADER.pack(self.size, self.hashes) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        size, hashes = HEADER.unpack_from(data)
+        return cls(size, hashes, data[HEADER.size:])
+
+
+def build_filter():
+    jtis = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now()).values_list('token__jti', flat=True)
+    bloom = BloomFilter.for_capacity(jtis.count(), settings.TOKEN_BLACKLIST_FILTER_FP_RATE)
+    for jti in jtis.iterator(chunk_size=5000):
+        bloom.add(jti)
+    return bloom
+
+
+def _load_filter():
+    key = FILTER_KEY.format(get_version(NAMESPACE))
+    data = cache.get(key)
+    if data is not None:
+        return BloomFilter.from_bytes(data)
+    bloom = build_filter()
+    cache.set(key, bloom.to_bytes(), settings.TOKEN_BLACKLIST_FILTER_TIMEOUT)
+    return bloom
+
+
+blacklist_filter = VersionedLocalCache(NAMESPACE, _load_filter)
+
+
+def might_be_blacklisted(jti):
+    """False means the token is certainly not blacklisted; True needs a database check."""
+    if not is_shared_cache():
+        return True  # another worker's logout would never reach this copy of the filter
+    return jti in blacklist_filter.get()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check only queries when the filter can't rule the token out."""
+
+    def check_blacklist(self):
+        if might_be_blacklisted(self.payload[jwt_settings.JTI_CLAIM]):
+            super().check_blacklist()
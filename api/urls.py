@@ -3,8 +3,8 @@ from .views import MyTokenObtainPairView,RegisterView
 from rest_framework_simplejwt.views import TokenRefreshView
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from api.admin_views import ProductAdminViewSet,ProductUpdateView,ProductDeleteView
-from api.views import (AddToCartView,RemoveFromCartView,
+from api.admin_views import ProductAdminViewSet,ProductUpdateView,ProductDeleteView,ResponseCacheStatsView,OrderExportView
+from api.views import (AddToCartView,RemoveFromCartView,CartBatchView,
                        UpdateProfileView,UserProfileView,UserDeleteView,
                        place_order_view,buy_now_view,list_products_view,
                        list_categories_view,list_subcategories_view,list_brands_view,
@@ -14,7 +14,8 @@ from api.views import (AddToCartView,RemoveFromCartView,
                        products_by_category_view,products_by_brand_view,
                        products_by_subcategory_view,logout_view,cart_item_count_view,
                        list_feedbacks_for_product,products_by_brand_ids_view,
-                       products_by_category_ids_view,products_by_subcategory_ids_view)
+                       products_by_category_ids_view,products_by_subcategory_ids_view,
+                       filter_products_view)
 
 router = DefaultRouter()
 router.register(r'admin/products', ProductAdminViewSet, basename='admin-products')
@@ -22,14 +23,18 @@ router.register(r'admin/products', ProductAdminViewSet, basename='admin-products
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('async/', include('api.async_urls')),
     path('login/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('register/', RegisterView.as_view(), name='register'),
 
     path('admin/products/<int:pk>/update/', ProductUpdateView.as_view(), name='product-update'),
     path('admin/products/<int:pk>/delete/', ProductDeleteView.as_view(), name='product-delete'),
+    path('admin/cache-stats/', ResponseCacheStatsView.as_view(), name='response-cache-stats'),
+    path('admin/orders/export/', OrderExportView.as_view(), name='order-export'),
 
     path('cart/add/', AddToCartView.as_view(), name='add-to-cart'),
+    path('cart/batch/', CartBatchView.as_view(), name='cart-batch'),
     path('cart/remove/<int:cart_item_id>/', RemoveFromCartView.as_view(), name='remove-from-cart'),
     path('cart/count/', cart_item_count_view, name='cart-item-count'),
 
@@ -41,6 +46,7 @@ urlpatterns = [
     path('products/by-category-ids/', products_by_category_ids_view),
     path('products/by-brand-ids/', products_by_brand_ids_view),
     path('products/by-subcategory-ids/', products_by_subcategory_ids_view),
+    path('products/filter/', filter_products_view, name='product-filter'),
 
     path('user/profile/update/', UpdateProfileView.as_view(), name='update-profile'),
     path('user/profile/', UserProfileView.as_view(), name='user-profile'),
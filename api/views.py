@@ -1,22 +1,38 @@
+import logging
+
 from django.shortcuts import render
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import (MyTokenObtainPairSerializer,RegisterSerializer,
                           AddToCartSerializer,UserProfileSerializer,OrderSerializer,
-                          ProductListSerializer,CategorySerializer,BrandSerializer,SubCategorySerializer,
+                          ProductListSerializer,
                           CreateFeedbackSerializer,FeedbackSerializer,ProductDetailSerializer,
-                          OrderTrackSerializer,CartItemSerializer)
+                          OrderTrackSerializer,OrderSummarySerializer,CartItemSerializer,CartBatchSerializer)
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework import status,viewsets
-from .models import Product,Cart,CartItem, Order, OrderItem,StoreSetting,OrderStatus,Category,Brand,SubCategory,Feedback
+from rest_framework.exceptions import ValidationError
+from .models import Product,Cart,CartItem, Order, OrderItem,Feedback
+from decimal import Decimal, InvalidOperation
 from django.db import transaction
+from django.db.models import Case, F, IntegerField, Prefetch, Q, When
 from rest_framework.permissions import IsAuthenticated,AllowAny
-from .pagination import ProductPagination,UserOrdersPagination
+from .pagination import FeedbackPagination,ProductPagination,UserOrdersPagination,get_product_paginator,wants_cursor
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.tokens import TokenError
+from .search import search_results
+from .query_budget import query_budget
+from .authentication import StatelessJWTAuthentication
+from .token_filter import FilteredRefreshToken
+from .taxonomy import get_taxonomy
+from .cache import DEFAULT_CACHE_PARAMS, bump_versions, cache_response
+from .facets import compute_facets, filter_products
+from .idempotency import idempotent
+from . import outbox, reservations, store_config
+from django.utils import timezone
+
 
+logger = logging.getLogger(__name__)
 
 class MyTokenObtainPairView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
@@ -31,7 +47,7 @@ class RegisterView(APIView):
         }
 
         serializer = RegisterSerializer(data=normalized_data)
-        print("Normalized:", normalized_data)
+        logger.debug("Register request with fields: %s", sorted(normalized_data))
 
         if serializer.is_valid():
             serializer.save()
@@ -54,37 +70,118 @@ class AddToCartView(APIView):
         if serializer.is_valid():
             product_id = serializer.validated_data['product_id']
             quantity = serializer.validated_data['quantity']
-            print(product_id,quantity)
+            logger.debug("Add to cart: product=%s quantity=%s", product_id, quantity)
 
-            try:
-                product = Product.objects.get(id=product_id)
-            except Product.DoesNotExist:
-                return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
+            with transaction.atomic():
+                try:
+                    # Lock the product so concurrent adds see each other's reservations
+                    product = Product.objects.select_for_update().get(id=product_id)
+                except Product.DoesNotExist:
+                    return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
-            # Get or create cart for user
-            cart, _ = Cart.objects.get_or_create(user=request.user)
+                # Get or create cart for user
+                cart, _ = Cart.objects.get_or_create(user=request.user)
 
-            # Get or create cart item
-            cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
+                # Get or create cart item
+                cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
 
-            new_quantity = quantity if created else cart_item.quantity + quantity
+                new_quantity = quantity if created else cart_item.quantity + quantity
 
-            # Check against stock
-            if new_quantity > product.stock:
-                return Response(
-                    {"error": f"Only {product.stock} units in stock. You already have {cart_item.quantity} in cart."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+                # Check against stock not held by other carts
+                available = reservations.available_to_sell(product, exclude_user_id=request.user.id)
+                if new_quantity > available:
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"error": f"Only {available} units available. You already have {0 if created else cart_item.quantity} in cart."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-            # Update quantity and save
-            cart_item.quantity = new_quantity
-            cart_item.save()
+                # Update quantity, save and hold the stock for this cart
+                cart_item.quantity = new_quantity
+                cart_item.save()
+                reservations.hold([cart_item])
 
             return Response({"message": "Product added to cart."}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class CartBatchView(APIView):
+    """Apply a list of add/set/remove operations to the cart in one transaction."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        operations = serializer.validated_data['operations']
+        product_ids = {operation['product_id'] for operation in operations}
+
+        with transaction.atomic():
+            cart, _ = Cart.objects.get_or_create(user=request.user)
+            products = {
+                product.id: product
+                for product in Product.objects.select_for_update()
+                .filter(id__in=product_ids).only('id', 'name', 'stock').order_by('id')
+            }
+            held = reservations.reserved_quantities(products, exclude_user_id=request.user.id)
+            items = {item.product_id: item for item in CartItem.objects.filter(cart=cart, product_id__in=product_ids)}
+
+            # Replay the operations on the current quantities, then validate the end state once
+            quantities = {product_id: item.quantity for product_id, item in items.items()}
+            errors = []
+            for index, operation in enumerate(operations):
+                product_id = operation['product_id']
+                if product_id not in products:
+                    errors.append({"index": index, "product_id": product_id, "error": "Product not found."})
+                elif operation['op'] == 'add':
+                    quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+                elif operation['op'] == 'set':
+                    quantities[product_id] = operation['quantity']
+                else:
+                    quantities[product_id] = 0
+
+            for product_id, quantity in quantities.items():
+                if quantity <= (items[product_id].quantity if product_id in items else 0):
+                    continue  # shrinking or removing a line is always allowed, even after stock dropped
+                product = products[product_id]
+                available = product.stock - held.get(product_id, 0)
+                if quantity > available:
+                    errors.append({
+                        "product_id": product_id,
+                        "error": f"Only {available} units of {product.name} available.",
+                    })
+            if errors:
+                return Response({"errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            to_create, to_update, to_delete = [], [], []
+            for product_id, quantity in quantities.items():
+                item = items.get(product_id)
+                if item is None:
+                    if quantity > 0:
+                        to_create.append(CartItem(cart=cart, product_id=product_id, quantity=quantity))
+                elif quantity == 0:
+                    to_delete.append(item.id)
+                elif quantity != item.quantity:
+                    item.quantity = quantity
+                    to_update.append(item)
+
+            CartItem.objects.bulk_create(to_create)
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                CartItem.objects.filter(id__in=to_delete).delete()
+            # Refresh the holds of every line the batch touched
+            reservations.hold(to_create + [
+                item for product_id, item in items.items() if quantities[product_id] > 0
+            ])
+
+        cart_items = cart.items.select_related('product')
+        return Response({
+            "message": "Cart updated.",
+            "items": CartItemSerializer(cart_items, many=True, context={'request': request}).data,
+        }, status=status.HTTP_200_OK)
+
+
 class RemoveFromCartView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -106,7 +203,7 @@ class UpdateProfileView(APIView):
     permission_classes = [IsAuthenticated]
 
     def patch(self, request):
-        print(request.data)
+        logger.debug("Profile update fields: %s", sorted(request.data))
         serializer = UserProfileSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
@@ -141,82 +238,157 @@ class UserDeleteView(APIView):
     
 
 
+class OutOfStock(Exception):
+    pass
+
+
+def _deduct_stock(quantities):
+    """
+    Deduct {product_id: quantity} from stock with a single conditional UPDATE,
+    raising OutOfStock (and changing nothing) if any product is short.
+
+    Other users' cart holds are not considered here: callers check them with
+    the products locked in the same transaction (see api.reservations).
+
+    A queryset update sends no Product pre_save/post_save, so the handlers in
+    api.signals don't run: no search reindex (stock isn't indexed), no product
+    listing namespace bumps and no replica catalog pin. Only the ``stock``
+    namespace, which in-stock filters and facets depend on, is bumped here.
+    """
+    in_stock = Q()
+    for product_id, quantity in quantities.items():
+        in_stock |= Q(id=product_id, stock__gte=quantity)
+
+    updated = Product.objects.filter(in_stock).update(stock=Case(
+        *[When(id=product_id, then=F('stock') - quantity) for product_id, quantity in quantities.items()],
+        default=F('stock'),
+        output_field=IntegerField(),
+    ))
+    if updated != len(quantities):
+        raise OutOfStock
+    bump_versions(['stock'])  # in-stock filters and facets depend on it
+
+
+def _publish_order_placed(order):
+    # Post-order side effects run from the outbox worker, not in the request
+    outbox.publish('order.placed', {
+        'order_id': order.id,
+        'user_id': order.user_id,
+        'total_price': order.total_price,
+        'item_count': order.item_count,
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def place_order_view(request):
     user = request.user
     try:
         cart = user.cart
-        cart_items = cart.items.all()
-
-        if not cart_items.exists():
-            return Response({"error": "Cart is empty."}, status=400)
-
-        total = sum([item.quantity * item.product.price for item in cart_items])
+    except Cart.DoesNotExist:
+        return Response({"error": "Cart not found."}, status=404)
 
+    try:
         with transaction.atomic():
-            # ✅ Get the default order status (e.g., ID=3)
-            default_status = OrderStatus.objects.get(name="Order Received")
+            cart_items = list(cart.items.select_related('product', 'reservation'))
+            if not cart_items:
+                return Response({"error": "Cart is empty."}, status=400)
 
-            order = Order.objects.create(
+            now = timezone.now()
+            products, quantities, unreserved = {}, {}, set()
+            for item in cart_items:
+                products[item.product_id] = item.product
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+                if not reservations.covers(item, now):
+                    unreserved.add(item.product_id)
+
+            # Stock is only enforced when the store deducts it. Lines still covered by a hold
+            # already fit in stock; only lapsed ones are re-checked, with their products
+            # locked in one query (id order avoids deadlocks)
+            deduct_stock = store_config.auto_stock_deduction()
+            shortages = []
+            if deduct_stock and unreserved:
+                locked = {
+                    product.id: product
+                    for product in Product.objects.select_for_update()
+                    .filter(id__in=unreserved).only('id', 'stock').order_by('id')
+                }
+                held = reservations.reserved_quantities(unreserved, exclude_user_id=user.id)
+                for product_id in sorted(unreserved):
+                    available = locked[product_id].stock - held.get(product_id, 0)
+                    if quantities[product_id] > available:
+                        shortages.append({
+                            "product_id": product_id,
+                            "product": products[product_id].name,
+                            "requested": quantities[product_id],
+                            "available": available,
+                        })
+            if shortages:
+                return Response({"error": "Not enough stock available.", "items": shortages}, status=400)
+
+            # ✅ Default order status, from the in-memory store config (no query)
+            default_status = store_config.order_status()
+
+            order = Order(
                 user=user,
-                total_price=total,
+                total_price=sum(products[product_id].price * quantity for product_id, quantity in quantities.items()),
                 status=default_status
             )
+            order.set_summary((item.product.name, item.quantity) for item in cart_items)
+            order.save()
 
-            # ✅ Get StoreSetting once before the loop
-            store_setting = StoreSetting.objects.first()
-
-            for item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    quantity=item.quantity,
-                    price=item.product.price
-                )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product_id=item.product_id, quantity=item.quantity, price=item.product.price)
+                for item in cart_items
+            ])
 
-                if store_setting and store_setting.auto_stock_deduction:
-                    item.product.stock -= item.quantity
-                    item.product.save()
+            if deduct_stock:
+                _deduct_stock(quantities)
 
-            # Clear cart
-            cart.items.all().delete()
+            # Clear cart (reservations go with it)
+            CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+            _publish_order_placed(order)
+    except OutOfStock:
+        return Response({"error": "Not enough stock available."}, status=400)
 
-        serializer = OrderSerializer(order)
-        return Response(serializer.data, status=201)
-
-    except Cart.DoesNotExist:
-        return Response({"error": "Cart not found."}, status=404)
+    serializer = OrderSerializer(order)
+    return Response(serializer.data, status=201)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def buy_now_view(request):
     product_id = request.data.get('product_id')
     quantity = int(request.data.get('quantity', 1))
-    print(product_id,quantity)
+    logger.debug("Buy now: product=%s quantity=%s", product_id, quantity)
 
     if not product_id:
         return Response({"error": "Product ID is required."}, status=400)
 
-    try:
-        product = Product.objects.get(id=product_id)
-    except Product.DoesNotExist:
-        return Response({"error": "Product not found."}, status=404)
+    with transaction.atomic():
+        # The row lock keeps other checkouts and new cart holds (also taken under it) out until the
+        # stock is deducted, so the units checked against other users' holds are still there
+        try:
+            product = Product.objects.select_for_update().get(id=product_id)
+        except Product.DoesNotExist:
+            return Response({"error": "Product not found."}, status=404)
 
-    if product.stock < quantity:
-        return Response({"error": "Not enough stock available."}, status=400)
+        if reservations.available_to_sell(product, exclude_user_id=request.user.id) < quantity:
+            return Response({"error": "Not enough stock available."}, status=400)
 
-    total_price = product.price * quantity
+        total_price = product.price * quantity
 
-    with transaction.atomic():
-        # ✅ Get the default order status (e.g., with ID = 3)
-        default_status = OrderStatus.objects.get(name="Order Received")
+        # ✅ Default order status, from the in-memory store config (no query)
+        default_status = store_config.order_status()
 
-        order = Order.objects.create(
+        order = Order(
             user=request.user,
             total_price=total_price,
             status=default_status  # Correct: assign instance, not string
         )
+        order.set_summary([(product.name, quantity)])
+        order.save()
 
         OrderItem.objects.create(
             order=order,
@@ -225,10 +397,13 @@ def buy_now_view(request):
             price=product.price
         )
 
-        setting = StoreSetting.objects.first()
-        if setting and setting.auto_stock_deduction:
-            product.stock -= quantity
-            product.save()
+        if store_config.auto_stock_deduction():
+            try:
+                _deduct_stock({product.id: quantity})
+            except OutOfStock:
+                transaction.set_rollback(True)
+                return Response({"error": "Not enough stock available."}, status=400)
+        _publish_order_placed(order)
 
     return Response({
         "message": "Order placed successfully.",
@@ -240,9 +415,11 @@ def buy_now_view(request):
 
 
 @api_view(['GET'])
+@cache_response(lambda request: ['products'])
+@query_budget(2)
 def list_products_view(request):
-    products = Product.objects.all()
-    paginator = ProductPagination()
+    products = Product.objects.select_related('brand')
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
@@ -250,38 +427,43 @@ def list_products_view(request):
 
 
 
-@api_view(['GET'])
-def list_categories_view(request):
-    categories = Category.objects.all()
+def _wants_full_tree(request):
+    return request.query_params.get('full', '').lower() in ('1', 'true')
 
+
+def _paginate_taxonomy(request, rows):
+    # Rows come pre-serialized from the taxonomy cache, so only the slicing happens per request
     paginator = PageNumberPagination()
     paginator.page_size = 10  # or set default in settings.py
-    result_page = paginator.paginate_queryset(categories, request)
-
-    serializer = CategorySerializer(result_page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    result_page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response(result_page)
 
 
+@api_view(['GET'])
+@query_budget(3)
+def list_categories_view(request):
+    taxonomy = get_taxonomy()
+    if _wants_full_tree(request):
+        return Response(taxonomy['tree'])  # categories with their subcategories, unpaginated
+    return _paginate_taxonomy(request, taxonomy['categories'])
 
 
 @api_view(['GET'])
+@query_budget(3)
 def list_subcategories_view(request):
-    subcategories = SubCategory.objects.all()
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
-    result_page = paginator.paginate_queryset(subcategories, request)
-    serializer = SubCategorySerializer(result_page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    taxonomy = get_taxonomy()
+    if _wants_full_tree(request):
+        return Response(taxonomy['subcategories'])
+    return _paginate_taxonomy(request, taxonomy['subcategories'])
 
 
 @api_view(['GET'])
+@query_budget(3)
 def list_brands_view(request):
-    brands = Brand.objects.all()
-    paginator = PageNumberPagination()
-    paginator.page_size = 10
-    result_page = paginator.paginate_queryset(brands, request)
-    serializer = BrandSerializer(result_page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    taxonomy = get_taxonomy()
+    if _wants_full_tree(request):
+        return Response(taxonomy['brands'])
+    return _paginate_taxonomy(request, taxonomy['brands'])
 
 
 
@@ -310,25 +492,36 @@ def edit_feedback_view(request, feedback_id):
         return Response({"message": "Feedback updated successfully."})
     return Response(serializer.errors, status=400)
 
+FEEDBACK_FEED_FIELDS = ('id', 'message', 'created_at', 'is_resolved', 'user_id', 'user__email', 'product__name')
+
+
+def _feedback_feed(request, feedbacks):
+    feedbacks = feedbacks.select_related('user', 'product').only(*FEEDBACK_FEED_FIELDS)
+    if not wants_cursor(request):
+        # Plain list, newest first, unless the client opts into pages with ?pagination=cursor
+        return Response(FeedbackSerializer(feedbacks.order_by('-created_at', '-pk'), many=True).data)
+    paginator = FeedbackPagination()
+    page = paginator.paginate_queryset(feedbacks, request)
+    return paginator.get_paginated_response(FeedbackSerializer(page, many=True).data)
+
+
 @api_view(['GET'])
+@authentication_classes([StatelessJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@query_budget(1)
 def list_user_feedback_view(request):
-    feedbacks = Feedback.objects.filter(user=request.user).order_by('-created_at')
-    serializer = FeedbackSerializer(feedbacks, many=True)
-    return Response(serializer.data)
+    return _feedback_feed(request, Feedback.objects.filter(user_id=request.user.id))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])  # Or IsAuthenticated if needed
+@cache_response(lambda request, product_id: [f'feedback:{product_id}'])
+@query_budget(2)
 def list_feedbacks_for_product(request, product_id):
-    try:
-        product = Product.objects.get(id=product_id)
-    except Product.DoesNotExist:
+    if not Product.objects.filter(id=product_id).exists():
         return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    feedbacks = Feedback.objects.filter(product=product).select_related('user').order_by('-created_at')
-    serializer = FeedbackSerializer(feedbacks, many=True)
-    return Response(serializer.data)
+    return _feedback_feed(request, Feedback.objects.filter(product_id=product_id))
 
 
 @api_view(['DELETE'])
@@ -343,9 +536,12 @@ def delete_feedback_view(request, feedback_id):
     return Response({"message": "Feedback deleted successfully."}, status=204)
 
 @api_view(['GET'])
+@query_budget(1)
 def product_detail_view(request, pk):
     try:
-        product = Product.objects.get(pk=pk)
+        product = Product.objects.select_related(
+            'brand', 'category', 'subcategory__category', 'feedback_stats',
+        ).get(pk=pk)
     except Product.DoesNotExist:
         return Response({"error": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -354,12 +550,27 @@ def product_detail_view(request, pk):
 
 
 @api_view(['GET'])
+@authentication_classes([StatelessJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@query_budget(3)
 def user_orders_view(request):
-    user = request.user
-    orders = Order.objects.filter(user=user).order_by('-created_at')
+    orders = Order.objects.filter(user_id=request.user.id).order_by('-created_at', '-id')
 
     paginator = UserOrdersPagination()  # instantiate it
+    if request.query_params.get('summary', '').lower() in ('1', 'true', 'yes'):
+        # Denormalized columns only: count + one page query, no OrderItem/OrderStatus joins
+        orders = orders.only('id', 'created_at', 'total_price', 'status_name', 'item_count', 'summary')
+        paginated_orders = paginator.paginate_queryset(orders, request)
+        serializer = OrderSummarySerializer(paginated_orders, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    # One prefetch plan for the page: count, orders, and all their lines with product names
+    lines = OrderItem.objects.select_related('product').only(
+        'id', 'order_id', 'quantity', 'price', 'product__id', 'product__name',
+    ).order_by('order_id', 'id')  # the order_id index already yields this order: no sort
+    orders = orders.only('id', 'created_at', 'total_price', 'status_name').prefetch_related(
+        Prefetch('items', queryset=lines)
+    )
     paginated_orders = paginator.paginate_queryset(orders, request)  # pass both arguments
 
     serializer = OrderTrackSerializer(paginated_orders, many=True, context={'request': request})
@@ -368,72 +579,73 @@ def user_orders_view(request):
 
 
 @api_view(['GET'])
+@authentication_classes([StatelessJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@query_budget(2)
 def my_cart_view(request):
-    user = request.user
     try:
-        cart = user.cart  # Assuming OneToOneField from User to Cart
+        cart = Cart.objects.get(user_id=request.user.id)
     except Cart.DoesNotExist:
         return Response({"error": "Cart not found."}, status=404)
 
-    items = cart.items.all()  # Assuming related_name='items' in CartItem FK to Cart
+    items = cart.items.select_related('product')  # Assuming related_name='items' in CartItem FK to Cart
     serializer = CartItemSerializer(items, many=True, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['GET'])
+@authentication_classes([StatelessJWTAuthentication])
 @permission_classes([IsAuthenticated])
+@query_budget(1)
 def cart_item_count_view(request):
-    user = request.user
-    try:
-        cart = user.cart  # Assuming OneToOneField from User to Cart
-    except Cart.DoesNotExist:
-        return Response({"count": 0})  # Return 0 if cart does not exist
-
-    count = cart.items.count()  # Assuming related_name='items' in CartItem
+    # 0 when the user has no cart yet
+    count = CartItem.objects.filter(cart__user_id=request.user.id).count()
     return Response({"count": count})
 
 
 @api_view(['GET'])
+@query_budget(3)
 def search_products_view(request):
-    query = request.GET.get('q', '').strip().lower()  # generic 'q' parameter
-
-    products = Product.objects.all()
-
-    if query:
-        products = products.filter(
-            Q(name__icontains=query) |
-            Q(brand__name__icontains=query) |
-            Q(category__name__icontains=query) |
-            Q(subcategory__name__icontains=query)
-        )
+    query = request.GET.get('q', '').strip()  # generic 'q' parameter
 
     paginator = ProductPagination()
-    result_page = paginator.paginate_queryset(products, request)
+    if query:
+        # Ranked ids come from the search index, which counts and slices them in SQL
+        product_ids = paginator.paginate_queryset(search_results(query), request)
+        products = Product.objects.select_related('brand').in_bulk(product_ids)
+        result_page = [products[pk] for pk in product_ids if pk in products]
+    else:
+        result_page = paginator.paginate_queryset(Product.objects.select_related('brand'), request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
+@cache_response(lambda request, category_id: [f'category:{category_id}'])
+@query_budget(2)
 def products_by_category_view(request, category_id):
-    products = Product.objects.filter(category_id=category_id)
-    paginator = ProductPagination()
+    products = Product.objects.filter(category_id=category_id).select_related('brand')
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
+@cache_response(lambda request, brand_id: [f'brand:{brand_id}'])
+@query_budget(2)
 def products_by_brand_view(request, brand_id):
-    products = Product.objects.filter(brand_id=brand_id)
-    paginator = ProductPagination()
+    products = Product.objects.filter(brand_id=brand_id).select_related('brand')
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
+@cache_response(lambda request, subcategory_id: [f'subcategory:{subcategory_id}'])
+@query_budget(2)
 def products_by_subcategory_view(request, subcategory_id):
-    products = Product.objects.filter(subcategory_id=subcategory_id)
-    paginator = ProductPagination()
+    products = Product.objects.filter(subcategory_id=subcategory_id).select_related('brand')
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
@@ -445,8 +657,8 @@ def products_by_subcategory_view(request, subcategory_id):
 def logout_view(request):
     try:
         refresh_token = request.data.get("refresh")
-        token = RefreshToken(refresh_token)
-        token.blacklist()
+        token = FilteredRefreshToken(refresh_token)
+        token.blacklist()  # bumps the blacklist filter version (api.signals)
         return Response({"message": "Logout successful."}, status=status.HTTP_205_RESET_CONTENT)
     except TokenError:
         return Response({"error": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
@@ -454,36 +666,84 @@ def logout_view(request):
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
 
+def _parse_ids(request, param='ids'):
+    ids = request.GET.get(param, '')
+    return [int(pk) for pk in ids.split(',') if pk.isdigit()]
+
+
 @api_view(['GET'])
+@cache_response(lambda request: [f'category:{pk}' for pk in _parse_ids(request)])
+@query_budget(2)
 def products_by_category_ids_view(request):
-    ids = request.GET.get('ids', '')
-    id_list = [int(pk) for pk in ids.split(',') if pk.isdigit()]
-    products = Product.objects.filter(category_id__in=id_list)
+    id_list = _parse_ids(request)
+    products = Product.objects.filter(category_id__in=id_list).select_related('brand')
 
-    paginator = ProductPagination()
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
+@cache_response(lambda request: [f'brand:{pk}' for pk in _parse_ids(request)])
+@query_budget(2)
 def products_by_brand_ids_view(request):
-    ids = request.GET.get('ids', '')
-    id_list = [int(pk) for pk in ids.split(',') if pk.isdigit()]
-    products = Product.objects.filter(brand_id__in=id_list)
+    id_list = _parse_ids(request)
+    products = Product.objects.filter(brand_id__in=id_list).select_related('brand')
 
-    paginator = ProductPagination()
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
 
 @api_view(['GET'])
+@cache_response(lambda request: [f'subcategory:{pk}' for pk in _parse_ids(request)])
+@query_budget(2)
 def products_by_subcategory_ids_view(request):
-    ids = request.GET.get('ids', '')
-    id_list = [int(pk) for pk in ids.split(',') if pk.isdigit()]
-    products = Product.objects.filter(subcategory_id__in=id_list)
+    id_list = _parse_ids(request)
+    products = Product.objects.filter(subcategory_id__in=id_list).select_related('brand')
 
-    paginator = ProductPagination()
+    paginator = get_product_paginator(request)
     result_page = paginator.paginate_queryset(products, request)
     serializer = ProductListSerializer(result_page, many=True, context={'request': request})
     return paginator.get_paginated_response(serializer.data)
+
+
+FACET_PARAMS = DEFAULT_CACHE_PARAMS + ('category_ids', 'subcategory_ids', 'brand_ids', 'min_price', 'max_price', 'in_stock')
+
+
+def _parse_price(request, param):
+    value = request.GET.get(param)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({param: "A valid number is required."})
+    if not price.is_finite():  # NaN/Infinity parse but can't be compared with the price column
+        raise ValidationError({param: "A valid number is required."})
+    return price
+
+
+@api_view(['GET'])
+@cache_response(lambda request: ['products', 'stock', 'taxonomy'], params=FACET_PARAMS)
+@query_budget(6)  # count + page + facet GROUP BY, plus 3 if the taxonomy cache reloads
+def filter_products_view(request):
+    selections = {
+        'category_id': _parse_ids(request, 'category_ids'),
+        'subcategory_id': _parse_ids(request, 'subcategory_ids'),
+        'brand_id': _parse_ids(request, 'brand_ids'),
+    }
+    options = {
+        'min_price': _parse_price(request, 'min_price'),
+        'max_price': _parse_price(request, 'max_price'),
+        'in_stock': request.GET.get('in_stock', '').lower() in ('1', 'true'),
+    }
+    products = filter_products(Product.objects.select_related('brand'), selections, **options)
+
+    paginator = get_product_paginator(request)
+    result_page = paginator.paginate_queryset(products, request)
+    serializer = ProductListSerializer(result_page, many=True, context={'request': request})
+    response = paginator.get_paginated_response(serializer.data)
+    response.data['facets'] = compute_facets(Product.objects.all(), selections, **options)
+    return response
@@ -55,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -85,13 +87,40 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.FilteredTokenRefreshSerializer',
 }
 
+# Bloom filter in front of the refresh-token blacklist (api.token_filter)
+TOKEN_BLACKLIST_FILTER_FP_RATE = float(os.environ.get("TOKEN_BLACKLIST_FILTER_FP_RATE", "0.01"))
+TOKEN_BLACKLIST_FILTER_TIMEOUT = int(os.environ.get("TOKEN_BLACKLIST_FILTER_TIMEOUT", "86400"))
+
+# How long api.authentication.StatelessJWTAuthentication trusts a cached is_active flag
+AUTH_ACTIVE_CACHE_TTL = int(os.environ.get("AUTH_ACTIVE_CACHE_TTL", "60"))
+
+# Raise instead of warn when a view runs more queries than its @query_budget
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", str(DEBUG)).lower() == "true"
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.TimedJWTAuthentication',
     ),
 }
+# Per-request timing (api.middleware.PerformanceMiddleware)
+PERF_INSTRUMENTATION = os.environ.get("PERF_INSTRUMENTATION", "True").lower() == "true"
+PERF_SERVER_TIMING = os.environ.get("PERF_SERVER_TIMING", str(DEBUG)).lower() == "true"
+PERF_LOG_REQUESTS = os.environ.get("PERF_LOG_REQUESTS", "True").lower() == "true"
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api": {"handlers": ["console"], "level": os.environ.get("API_LOG_LEVEL", "INFO")},
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -120,6 +149,53 @@ DATABASES = {
     "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
 }
 
+# Optional read replicas, comma-separated (api.db_router sends catalog reads there); needs a shared CACHE_BACKEND
+REPLICA_DATABASES = []
+for index, url in enumerate(filter(None, os.environ.get("DATABASE_REPLICA_URL", "").split(","))):
+    alias = f"replica{index}"
+    DATABASES[alias] = {**dj_database_url.parse(url.strip(), conn_max_age=600), "TEST": {"MIRROR": "default"}}
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter'] if REPLICA_DATABASES else []
+# Read-your-writes window: a user's reads stay on the primary this long after they write
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", "5"))
+
+# Cache backend shared by all workers in production (e.g. django.core.cache.backends.redis.RedisCache).
+# Cache versions, token filter, store config and replica pins are invalidated through it, so the
+# local-memory default only works for a single process: without CACHE_ALLOW_LOCAL=True (the default
+# with DEBUG off) catalog responses are served uncached, in-memory copies reload on every read and
+# `check --deploy` reports it (api.cache).
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+CACHE_ALLOW_LOCAL = os.environ.get("CACHE_ALLOW_LOCAL", str(DEBUG)).lower() == "true"
+
+# Upper bound for cached catalog responses; changes invalidate them earlier (see api.cache)
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+
+# How long (seconds) a checkout Idempotency-Key replays its first response
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Upper bound (seconds) on how stale a worker's StoreSetting/OrderStatus copy can get (api.store_config)
+STORE_CONFIG_MAX_AGE = int(os.environ.get("STORE_CONFIG_MAX_AGE", 60))
+
+# Seconds a cart line holds its stock before other shoppers can buy it
+CART_RESERVATION_TTL = int(os.environ.get("CART_RESERVATION_TTL", 15 * 60))
+
+# Outbox worker (api.outbox): retries back off exponentially from OUTBOX_BACKOFF_SECONDS up to
+# OUTBOX_BACKOFF_MAX, and an event is marked failed after OUTBOX_MAX_ATTEMPTS
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_SECONDS = int(os.environ.get("OUTBOX_BACKOFF_SECONDS", 5))
+OUTBOX_BACKOFF_MAX = int(os.environ.get("OUTBOX_BACKOFF_MAX", 60 * 60))
+# How long a worker owns a claimed event before another worker may pick it up again
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 5 * 60))
+
+# Product search backend: "database" or "memory" (single process only; empty = memory with DEBUG on
+# SQLite, database otherwise)
+PRODUCT_SEARCH_BACKEND = os.environ.get("PRODUCT_SEARCH_BACKEND", "")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators